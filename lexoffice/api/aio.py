@@ -0,0 +1,293 @@
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, Iterable
+
+try:
+    import httpx
+except ImportError:  # optional dependency
+    httpx = None
+
+from .api import (
+    DEFAULT_MAX_RETRIES, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, IDEMPOTENT_METHODS, MAX_RETRY_DELAY, RETRY_STATUS_CODES,
+    DEFAULT_INVOICE_CACHE_SIZE, DEFAULT_INVOICE_WORKERS, VOUCHERLIST_MAX_PAGE_SIZE, InvoiceRef,
+    _check_voucherlist_response, _contact_payload, _contact_query, _invoice_ref, _voucher_payload, _voucherlist_params
+)
+from .cache import LRUCache
+from .datatypes import Voucher, VoucherList, Invoice, VoucherType, VoucherStatus, TaxType
+from .decoding import loads
+from .exceptions import LexofficeException
+from .metrics import RequestMetrics, get_endpoint
+from .ratelimit import TokenBucket, get_backoff, get_retry_after
+from .upload import MultipartBody, UploadResult, UploadSource
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class AsyncLexofficeClient:
+    """ asyncio variant of LexofficeClient with the same methods as coroutines.
+
+    Built on httpx (optional dependency) with a keep-alive connection pool. At most
+    max_concurrency requests are in flight at once, and all of them share the rate limiter.
+    """
+
+    def __init__(self,
+                 api_key,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+                 max_concurrency: int = None,
+                 rate_limiter: TokenBucket = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 metrics: RequestMetrics = None):
+        if httpx is None:
+            raise ImportError('AsyncLexofficeClient requires httpx (pip install httpx)')
+        self.version = 1
+        self.url = f'https://api.lexoffice.io/v{self.version}'
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket()
+        self.max_retries = max_retries
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+        self.last_upload: UploadResult | None = None
+        self.invoice_cache = LRUCache(maxsize=DEFAULT_INVOICE_CACHE_SIZE)
+        self.headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Accept': 'application/json'
+        }
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(timeout[1], connect=timeout[0])
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency or pool_size)
+
+    async def close(self):
+        """ Close all pooled connections of this client. """
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _request(self, method: str, path: str, body: MultipartBody = None, **kwargs) -> 'httpx.Response':
+        """ Send a request to the Lexoffice API (see LexofficeClient._request).
+
+        :param body: Multipart body to be streamed (rewound on every attempt)
+        """
+        if body is not None:
+            kwargs['headers'] = {'Content-Type': body.content_type, 'Content-Length': str(len(body))}
+        idempotent = method in IDEMPOTENT_METHODS
+        endpoint = get_endpoint(path)
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                if self.rate_limiter:
+                    wait = self.rate_limiter.reserve()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                if body is not None:
+                    kwargs['content'] = _iter_body(body)
+
+                started = time.monotonic()
+                try:
+                    response = await self.client.request(method, f'{self.url}{path}', **kwargs)
+                except httpx.TransportError as e:
+                    self.metrics.observe_request(method, endpoint, 'error', time.monotonic() - started)
+                    if not isinstance(e, (httpx.ConnectTimeout, httpx.ConnectError, httpx.RemoteProtocolError)):
+                        raise
+                    if attempt >= self.max_retries or not (idempotent or isinstance(e, httpx.ConnectTimeout)):
+                        raise
+                    delay = get_backoff(attempt)
+                    reason = 'connection'
+                else:
+                    self.metrics.observe_request(method, endpoint, response.status_code, time.monotonic() - started)
+                    if attempt >= self.max_retries or response.status_code not in RETRY_STATUS_CODES:
+                        return response
+                    if response.status_code != 429 and not idempotent:
+                        return response
+                    delay = get_retry_after(response)
+                    if delay is None:
+                        delay = get_backoff(attempt)
+                    reason = str(response.status_code)
+
+                self.metrics.count_retry(method, endpoint, reason)
+                attempt += 1
+                await asyncio.sleep(min(delay, MAX_RETRY_DELAY))
+
+    async def ping(self) -> bool:
+        """ Ping Lexoffice API and test the connection.
+
+        :return: True if the /ping endpoint could be requested successfully.
+        """
+        response = await self._request('GET', '/ping')
+        return response.status_code == 200
+
+    async def get_voucherlist(self,
+                              voucher_type: VoucherType | list[VoucherType],
+                              status: list[VoucherStatus] = None,
+                              page: int = None,
+                              size: int = None,
+                              eager: bool = False,
+                              **filters) -> VoucherList:
+        """ Fetch a voucherlist (see LexofficeClient.get_voucherlist). """
+        content = await self._get_voucherlist_page(_voucherlist_params(voucher_type, status, page, size, **filters))
+        return VoucherList.decode(content) if eager else VoucherList(content)
+
+    async def iter_vouchers(self,
+                            voucher_type: VoucherType | list[VoucherType],
+                            status: list[VoucherStatus] = None,
+                            size: int = VOUCHERLIST_MAX_PAGE_SIZE,
+                            prefetch: bool = True,
+                            eager: bool = False,
+                            **filters) -> AsyncIterator[Voucher]:
+        """ Iterate over the vouchers of all pages of a voucherlist (see LexofficeClient.iter_vouchers). """
+        size = min(size, VOUCHERLIST_MAX_PAGE_SIZE)
+        make_voucher = Voucher.decode if eager else Voucher
+
+        def fetch(page):
+            return self._get_voucherlist_page(_voucherlist_params(voucher_type, status, page, size, **filters))
+
+        page = 0
+        content = await fetch(page)
+        next_page = None
+        try:
+            while True:
+                last = content.get('last', True) or not content.get('content')
+                next_page = asyncio.ensure_future(fetch(page + 1)) if prefetch and not last else None
+                for voucher in content.get('content') or []:
+                    yield make_voucher(voucher)
+                if last:
+                    return
+                page += 1
+                content = await (next_page or fetch(page))
+        finally:
+            if next_page and not next_page.done():
+                next_page.cancel()
+
+    async def _get_voucherlist_page(self, params: dict) -> dict:
+        response = await self._request('GET', '/voucherlist', params=params)
+        content = loads(response.content)
+        _check_voucherlist_response(response, content)
+        return content
+
+    async def get_invoice(self, invoice_id: uuid.UUID, eager: bool = False) -> Invoice:
+        """ Fetches an invoice with the specified ID from the /invoices endpoint (see LexofficeClient.get_invoice). """
+        response = await self._request('GET', f'/invoices/{str(invoice_id)}')
+        if response.status_code != 200:
+            raise LexofficeException(response, 'Error while getting invoice from Lexoffice API')
+        content = loads(response.content)
+        return Invoice.decode(content) if eager else Invoice(content)
+
+    async def get_invoices(self, invoices: Iterable[InvoiceRef], max_workers: int = DEFAULT_INVOICE_WORKERS,
+                           eager: bool = False) -> list[Invoice]:
+        """ Fetch many invoices concurrently, skipping cached unchanged ones (see LexofficeClient.get_invoices). """
+        refs = [_invoice_ref(invoice) for invoice in invoices]
+        make_invoice = Invoice.decode if eager else Invoice
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def fetch(invoice_id, version):
+            cached = self.invoice_cache.get(f'{invoice_id}:{version}') if self.invoice_cache is not None and version else None
+            if cached is not None:
+                return make_invoice(cached)
+            async with semaphore:
+                invoice = await self.get_invoice(invoice_id, eager=eager)
+            if self.invoice_cache is not None:
+                self.invoice_cache.set(f'{invoice_id}:{version or invoice.to_dict().get("updatedDate")}', invoice.to_dict())
+            return invoice
+
+        return list(await asyncio.gather(*(fetch(invoice_id, version) for invoice_id, version in refs)))
+
+    async def upload_file(self, path: str, source: UploadSource, filename: str = None, fields: dict = None) -> UploadResult:
+        """ Upload a file as multipart/form-data (see LexofficeClient.upload_file). """
+        with MultipartBody(source, filename=filename, fields=fields) as body:
+            started = time.monotonic()
+            response = await self._request('POST', path, body=body)
+            elapsed = time.monotonic() - started
+
+            if response.status_code not in (200, 201, 202):
+                raise LexofficeException(response, 'Error while uploading PDF to Lexoffice API')
+            self.metrics.count_upload(get_endpoint(path), len(body))
+
+            self.last_upload = UploadResult(
+                file_id=response.json()['id'],
+                filename=body.filename,
+                bytes_sent=len(body),
+                elapsed=elapsed,
+                status_code=response.status_code
+            )
+        return self.last_upload
+
+    async def upload_pdf(self, file: UploadSource, filename: str = None) -> str:
+        """ Upload a PDF file to lexoffice.
+
+        :return: ID to the uploaded file
+        """
+        return (await self.upload_file('/files', file, filename=filename, fields={'type': 'voucher'})).file_id
+
+    async def upload_voucher_file(self, voucher_id: str, file: UploadSource, filename: str = None) -> UploadResult:
+        """ Attach a file (e.g. the invoice PDF) to an existing voucher.
+
+        :param voucher_id: ID of the voucher
+        :param file: Path to the file, its content or a binary stream
+        :param filename: Name of the file in lexoffice (optional for paths)
+        :return: UploadResult with the ID of the uploaded file
+        """
+        return await self.upload_file(f'/vouchers/{voucher_id}/files', file, filename=filename)
+
+    async def create_voucher(self,
+                             type: VoucherType,
+                             voucher_number: str,
+                             voucher_date: str,
+                             total_gross_amount: float,
+                             total_tax_amount: float,
+                             tax_type: TaxType,
+                             use_collective_contact: bool,
+                             contact_id: str,
+                             voucher_items: list[dict],
+                             file_path: str = None,
+                             file: UploadSource = None,
+                             filename: str = None) -> str:
+        response = await self._request(
+            'POST',
+            '/vouchers',
+            json=_voucher_payload(type, voucher_number, voucher_date, total_gross_amount, total_tax_amount,
+                                  tax_type, use_collective_contact, contact_id, voucher_items)
+        )
+        if response.status_code != 200:
+            raise LexofficeException(response, 'Error while creating voucher in Lexoffice API')
+        id = response.json()['id']
+
+        file = file if file is not None else file_path
+        if file is not None:
+            await self.upload_voucher_file(id, file, filename=filename)
+
+        return id
+
+    async def create_or_get_contact(self,
+                                    roles: dict,
+                                    company: dict | None,
+                                    person: dict | None,
+                                    email: str = None,
+                                    version: int = 0) -> str:
+        response = await self._request('GET', '/contacts', params=_contact_query(roles, company, person))
+        if response.status_code != 200:
+            raise LexofficeException(response, 'Error while getting contacts in Lexoffice API')
+        contacts = response.json()
+
+        if len(contacts['content']) > 0:
+            return contacts['content'][0]['id']
+
+        response = await self._request('POST', '/contacts', json=_contact_payload(roles, company, person, email, version))
+        if response.status_code != 200:
+            raise LexofficeException(response, 'Error while creating or contact in Lexoffice API')
+
+        return response.json()['id']
+
+
+async def _iter_body(body: MultipartBody):
+    body.seek(0)
+    while chunk := body.read(UPLOAD_CHUNK_SIZE):
+        yield bytes(chunk)
@@ -1,33 +1,278 @@
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Iterable, Iterator, Union
 import requests
-from requests.exceptions import RequestException
-from .datatypes import VoucherList, Invoice, VoucherType, VoucherStatus, TaxType
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, ConnectTimeout, RequestException
+from .cache import LRUCache
+from .datatypes import Voucher, VoucherList, Invoice, VoucherType, VoucherStatus, TaxType
+from .decoding import loads
 from .exceptions import LexofficeException
-from urllib import parse
-import pycurl
-import json
-import certifi
+from .metrics import RequestMetrics, get_endpoint
+from .ratelimit import TokenBucket, get_backoff, get_retry_after
+from .upload import MultipartBody, UploadResult, UploadSource
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (5.0, 60.0)
+DEFAULT_MAX_RETRIES = 5
+MAX_RETRY_DELAY = 60.0
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+VOUCHERLIST_MAX_PAGE_SIZE = 250
+DEFAULT_INVOICE_WORKERS = 4
+DEFAULT_INVOICE_CACHE_SIZE = 1000
+
+# Keyword arguments accepted as voucherlist filters and their query parameters
+VOUCHERLIST_FILTERS = {
+    'archived': 'archived',
+    'contact_id': 'contactId',
+    'contact_name': 'contactName',
+    'voucher_number': 'voucherNumber',
+    'voucher_date_from': 'voucherDateFrom',
+    'voucher_date_to': 'voucherDateTo',
+    'created_date_from': 'createdDateFrom',
+    'created_date_to': 'createdDateTo',
+    'updated_date_from': 'updatedDateFrom',
+    'updated_date_to': 'updatedDateTo',
+    'sort': 'sort',
+}
+
+_clients: dict[str, 'LexofficeClient'] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str,
+               pool_size: int = DEFAULT_POOL_SIZE,
+               timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+               rate_limiter: TokenBucket = None,
+               max_retries: int = DEFAULT_MAX_RETRIES) -> 'LexofficeClient':
+    """ Get the client for an API key from the per-process client cache.
+
+    The client (and with it its connection pool) is reused by every caller in this process
+    that uses the same API key. It is rebuilt if the pool size or timeouts have changed.
+
+    :param api_key: Lexoffice API key
+    :param pool_size: Max. number of keep-alive connections to the Lexoffice API
+    :param timeout: (connect, read) timeout in seconds
+    :param rate_limiter: Rate limiter to be used by the client (optional)
+    :param max_retries: Max. number of retries of throttled or failed requests
+    :return: Shared LexofficeClient
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None or client.pool_size != pool_size or client.timeout != timeout:
+            if client is not None:
+                client.close()
+            client = LexofficeClient(api_key, pool_size=pool_size, timeout=timeout)
+            _clients[api_key] = client
+        if rate_limiter is not None:
+            client.rate_limiter = rate_limiter
+        client.max_retries = max_retries
+        return client
+
+
+def clear_clients():
+    """ Close and drop all cached clients of this process. """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def _voucherlist_params(voucher_type: VoucherType | list[VoucherType],
+                        status: list[VoucherStatus] = None,
+                        page: int = None,
+                        size: int = None,
+                        **filters) -> dict:
+    if status is None:
+        status_str = ["any"]
+    else:
+        status_str = []
+        for s in status:
+            status_str.append(s.value)
+    if isinstance(voucher_type, VoucherType):
+        voucher_type = [voucher_type]
+    params = {
+        'voucherType': ','.join(t.value for t in voucher_type),
+        'voucherStatus': ','.join(status_str),
+        'page': page,
+        'size': size
+    }
+    for name, value in filters.items():
+        if name not in VOUCHERLIST_FILTERS:
+            raise TypeError(f'Unknown voucherlist filter: {name}')
+        if isinstance(value, (date, datetime)):
+            value = value.strftime('%Y-%m-%d')
+        elif isinstance(value, bool):
+            value = str(value).lower()
+        params[VOUCHERLIST_FILTERS[name]] = value
+    return {key: value for key, value in params.items() if value is not None}
+
+
+InvoiceRef = Union[Voucher, tuple, uuid.UUID, str]
+
+
+def _invoice_ref(invoice: InvoiceRef) -> tuple[str, str | None]:
+    """ (id, version) of an invoice reference for get_invoices. """
+    if isinstance(invoice, Voucher):
+        return str(invoice.id), invoice.to_dict().get('updatedDate')
+    if isinstance(invoice, tuple):
+        return str(invoice[0]), (str(invoice[1]) if invoice[1] is not None else None)
+    return str(invoice), None
+
+
+def _check_voucherlist_response(response, content: dict):
+    if response.status_code != 200:
+        if 'error' in content and 'message' in content:
+            error = content['error']
+            msg = content['message']
+            raise RequestException(f'{error}: {msg}')
+        else:
+            msg = content['message']
+            raise RequestException(f'Error while getting VoucherList from Lexoffice API: {msg}')
+
+
+def _voucher_payload(type, voucher_number, voucher_date, total_gross_amount, total_tax_amount,
+                     tax_type, use_collective_contact, contact_id, voucher_items) -> dict:
+    return {
+        'type': type,
+        'voucherNumber': voucher_number,
+        'voucherDate': voucher_date,
+        'totalGrossAmount': total_gross_amount,
+        'totalTaxAmount': total_tax_amount,
+        'taxType': tax_type,
+        'useCollectiveContact': use_collective_contact,
+        'contactId': contact_id,
+        'voucherItems': voucher_items
+    }
+
+
+def _contact_query(roles: dict, company: dict | None, person: dict | None) -> dict:
+    # Get name of contact
+    if company:
+        name = company['name']
+    elif person:
+        name = f'{person["firstName"]}{person["lastName"]}'
+    else:
+        raise ValueError('Either company or person must be given')
+    return {
+        'name': name,
+        'customer': 'customer' in roles,
+        'vendor': 'vendor' in roles
+    }
+
+
+def _contact_payload(roles: dict, company: dict | None, person: dict | None, email: str = None, version: int = 0) -> dict:
+    return {
+        'roles': roles,
+        'company': company,
+        'person': person,
+        'email': email,
+        'version': version
+    }
+
 
 class LexofficeClient:
 
-    def __init__(self, api_key):
+    def __init__(self,
+                 api_key,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+                 rate_limiter: TokenBucket = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 metrics: RequestMetrics = None):
         self.version = 1
         self.url = f'https://api.lexoffice.io/v{self.version}'
         self.api_key = api_key
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket()
+        self.max_retries = max_retries
+        # Receives latency, status, retries and bytes uploaded of all requests
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+        self.last_upload: UploadResult | None = None
+        # Raw invoices by "id:updatedDate" (any object with get/set, e.g. LRUCache or RedisCache)
+        self.invoice_cache = LRUCache(maxsize=DEFAULT_INVOICE_CACHE_SIZE)
         self.headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Accept': 'application/json'
         }
 
+        # Keep-alive connection pool shared by all calls of this client
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self):
+        """ Close all pooled connections of this client. """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """ Send a request to the Lexoffice API over the pooled session.
+
+        Every attempt waits for the rate limiter first. Requests rejected with 429 are retried
+        with exponential backoff, honoring Retry-After. Idempotent requests are also retried
+        on 5xx gateway errors and connection errors.
+
+        :param method: HTTP method
+        :param path: Path relative to the API base URL, e.g. '/contacts'
+        :return: Response of the API (the last one if retries are exhausted)
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        body = kwargs.get('data')
+        idempotent = method in IDEMPOTENT_METHODS
+        endpoint = get_endpoint(path)
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            if attempt and hasattr(body, 'seek'):
+                body.seek(0)
+
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, f'{self.url}{path}', **kwargs)
+            except RequestException as e:
+                self.metrics.observe_request(method, endpoint, 'error', time.monotonic() - started)
+                if not isinstance(e, (ConnectTimeout, ConnectionError)):
+                    raise
+                if attempt >= self.max_retries or not (idempotent or isinstance(e, ConnectTimeout)):
+                    raise
+                delay = get_backoff(attempt)
+                reason = 'connection'
+            else:
+                self.metrics.observe_request(method, endpoint, response.status_code, time.monotonic() - started)
+                if attempt >= self.max_retries or response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                if response.status_code != 429 and not idempotent:
+                    return response
+                delay = get_retry_after(response)
+                if delay is None:
+                    delay = get_backoff(attempt)
+                reason = str(response.status_code)
+                response.close()
+
+            self.metrics.count_retry(method, endpoint, reason)
+            attempt += 1
+            time.sleep(min(delay, MAX_RETRY_DELAY))
+
     def ping(self) -> bool:
         """ Ping Lexoffice API and test the connection.
 
         :return: True if the /ping endpoint could be requested successfully.
         """
-        response = requests.get(
-            url=f'{self.url}/ping',
-            headers=self.headers
-        )
+        response = self._request('GET', '/ping')
         if response.status_code == 200:
             print('Connected to lexoffice Public API')
             print('User:', response.json()['userEmail'])
@@ -35,92 +280,177 @@ class LexofficeClient:
         else:
             return False
 
-    def get_voucherlist(self, voucher_type: VoucherType, status: list[VoucherStatus] = None, page: int = None, size: int = None) -> VoucherList:
+    def get_voucherlist(self,
+                        voucher_type: VoucherType | list[VoucherType],
+                        status: list[VoucherStatus] = None,
+                        page: int = None,
+                        size: int = None,
+                        eager: bool = False,
+                        **filters) -> VoucherList:
         """ Fetch a voucherlist.
 
         :param voucher_type: type(s) of the vouchers to be fetched
         :param status: status(es) of the vouchers to be fetched
         :param page: Number of the page to be fetched (optional) - If not specified, the first page will be fetched
         :param size: Size of the page (max. number of vouchers to be fetched
+        :param eager: Decode all attributes of the vouchers in one pass (faster if most of them are read)
+        :param filters: Filters by date, contact, voucher number or archived flag and sort order (see VOUCHERLIST_FILTERS)
         :return: VoucherList contatining the requested Vouchers
         """
-        if status is None:
-            status_str = ["any"]
-        else:
-            status_str = []
-            for s in status:
-                status_str.append(s.value)
-        params = {
-            'voucherType': voucher_type.value,
-            'voucherStatus': ','.join(status_str),
-            'page': page,
-            'size': size
-        }
-        response = requests.get(
-            url=f'{self.url}/voucherlist',
-            headers=self.headers,
-            params=params
-        )
-        content = response.json()
-        if response.status_code != 200:
-            if 'error' in content and 'message' in content:
-                error = content['error']
-                msg = content['message']
-                raise RequestException(f'{error}: {msg}')
-            else:
-                msg = content['message']
-                raise RequestException(f'Error while getting VoucherList from Lexoffice API: {msg}')
-        return VoucherList(content)
+        content = self._get_voucherlist_page(_voucherlist_params(voucher_type, status, page, size, **filters))
+        return VoucherList.decode(content) if eager else VoucherList(content)
+
+    def iter_vouchers(self,
+                      voucher_type: VoucherType | list[VoucherType],
+                      status: list[VoucherStatus] = None,
+                      size: int = VOUCHERLIST_MAX_PAGE_SIZE,
+                      prefetch: bool = True,
+                      eager: bool = False,
+                      **filters) -> Iterator[Voucher]:
+        """ Iterate over the vouchers of all pages of a voucherlist.
+
+        Vouchers are built lazily one at a time, and only the current page (plus the next one
+        when prefetching) is held in memory. With prefetch, the next page is requested in the
+        background while the current one is being processed.
 
-    def get_invoice(self, invoice_id: uuid.UUID) -> Invoice:
+        :param voucher_type: type(s) of the vouchers to be fetched
+        :param status: status(es) of the vouchers to be fetched
+        :param size: Page size (max. 250)
+        :param prefetch: Fetch the next page in the background
+        :param eager: Decode all attributes of the vouchers in one pass (faster if most of them are read)
+        :param filters: Filters and sort order, as for get_voucherlist
+        :return: Iterator over all matching Vouchers
+        """
+        size = min(size, VOUCHERLIST_MAX_PAGE_SIZE)
+        make_voucher = Voucher.decode if eager else Voucher
+
+        def fetch(page):
+            return self._get_voucherlist_page(_voucherlist_params(voucher_type, status, page, size, **filters))
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lexoffice-voucherlist') if prefetch else None
+        try:
+            page = 0
+            content = fetch(page)
+            while True:
+                last = content.get('last', True) or not content.get('content')
+                next_page = executor.submit(fetch, page + 1) if executor and not last else None
+                for voucher in content.get('content') or []:
+                    yield make_voucher(voucher)
+                if last:
+                    return
+                page += 1
+                content = next_page.result() if next_page else fetch(page)
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_voucherlist_page(self, params: dict) -> dict:
+        response = self._request('GET', '/voucherlist', params=params)
+        content = loads(response.content)
+        _check_voucherlist_response(response, content)
+        return content
+
+    def get_invoice(self, invoice_id: uuid.UUID, eager: bool = False) -> Invoice:
         """ Fetches an invoice with the specified ID from the /invoices endpoint.
 
         :param invoice_id: The UUID of the requested invoice
+        :param eager: Decode all attributes in one pass (faster if most of them are read)
         :return: Invoice that was requested
         :raise RequestException if an error has occurred during the API call.
         """
-        response = requests.get(
-            url=f'{self.url}/invoices/{str(invoice_id)}',
-            headers=self.headers
-        )
-        content = response.json()
+        response = self._request('GET', f'/invoices/{str(invoice_id)}')
         if response.status_code != 200:
             raise LexofficeException(response, 'Error while getting invoice from Lexoffice API')
-        return Invoice(content)
+        content = loads(response.content)
+        return Invoice.decode(content) if eager else Invoice(content)
     
-    def upload_pdf(self, file_path: str) -> str:
+    def get_invoices(self, invoices: Iterable[InvoiceRef], max_workers: int = DEFAULT_INVOICE_WORKERS,
+                     eager: bool = False) -> list[Invoice]:
+        """ Fetch many invoices concurrently, skipping unchanged ones that are already cached.
+
+        An invoice is identified by its ID and its updatedDate (or version). Passing the
+        Vouchers of a voucherlist (or (id, updatedDate) tuples) lets invoices that have not
+        changed since they were cached be served from invoice_cache without a request.
+        Plain IDs are always fetched.
+
+        :param invoices: Vouchers, (id, updatedDate/version) tuples or invoice IDs
+        :param max_workers: Max. number of concurrent requests
+        :param eager: Decode all attributes of the invoices in one pass (see get_invoice)
+        :return: Invoices in the order of the given references
+        """
+        refs = [_invoice_ref(invoice) for invoice in invoices]
+        make_invoice = Invoice.decode if eager else Invoice
+        results: list[Invoice | None] = [None] * len(refs)
+        missing = []
+        for index, (invoice_id, version) in enumerate(refs):
+            cached = self.invoice_cache.get(f'{invoice_id}:{version}') if self.invoice_cache is not None and version else None
+            if cached is not None:
+                results[index] = make_invoice(cached)
+            else:
+                missing.append(index)
+
+        def fetch(index):
+            invoice_id, version = refs[index]
+            invoice = self.get_invoice(invoice_id, eager=eager)
+            if self.invoice_cache is not None:
+                self.invoice_cache.set(f'{invoice_id}:{version or invoice.to_dict().get("updatedDate")}', invoice.to_dict())
+            return invoice
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing))), thread_name_prefix='lexoffice-invoices') as executor:
+                for index, invoice in zip(missing, executor.map(fetch, missing)):
+                    results[index] = invoice
+        return results
+
+    def upload_file(self, path: str, source: UploadSource, filename: str = None, fields: dict = None) -> UploadResult:
+        """ Upload a file as multipart/form-data over the pooled session.
+
+        The file is streamed from disk, from the in-memory buffer or from the given stream
+        without building the request body in memory.
+
+        :param path: Path of the upload endpoint relative to the API base URL
+        :param source: Path of the file, bytes/memoryview of its content or a binary stream
+        :param filename: Name of the file in lexoffice (optional for paths and named streams)
+        :param fields: Additional form fields
+        :return: UploadResult with the ID of the uploaded file, bytes sent and elapsed time
+        :raise LexofficeException if the file was not accepted by the API.
+        """
+        with MultipartBody(source, filename=filename, fields=fields) as body:
+            started = time.monotonic()
+            response = self._request('POST', path, data=body, headers={'Content-Type': body.content_type})
+            elapsed = time.monotonic() - started
+
+            if response.status_code not in (200, 201, 202):
+                raise LexofficeException(response, 'Error while uploading PDF to Lexoffice API')
+            self.metrics.count_upload(get_endpoint(path), len(body))
+
+            self.last_upload = UploadResult(
+                file_id=response.json()['id'],
+                filename=body.filename,
+                bytes_sent=len(body),
+                elapsed=elapsed,
+                status_code=response.status_code
+            )
+        return self.last_upload
+
+    def upload_pdf(self, file: UploadSource, filename: str = None) -> str:
         """ Upload a PDF file to lexoffice.
 
-        :param file_path: Path to the PDF file to be uploaded
+        :param file: Path to the PDF file, its content or a binary stream
+        :param filename: Name of the file in lexoffice (optional for paths)
         :return: ID to the uploaded file
         """
-        c = pycurl.Curl()
-        c.setopt(c.URL, f'{self.url}/files')
-        c.setopt(c.POST, 1)
-        c.setopt(c.HTTPHEADER, [
-            f'Authorization: Bearer {self.api_key}',
-            "Accept: application/json",
-            "Content-Type: multipart/form-data"
-        ])
-
-        with open(file_path, 'rb') as file:
-            c.setopt(c.HTTPPOST, [
-                ("file", (
-                     c.FORM_FILE, file.name,
-                     c.FORM_FILENAME, parse.quote(file.name)
-                 )
-                 ),
-                ("type", "voucher")
-            ])
-            response = c.perform_rs()
-            status_code = c.getinfo(c.RESPONSE_CODE)
-            c.close()
-
-        if status_code != 202:
-            raise LexofficeException(response, 'Error while uploading PDF to Lexoffice API')
-
-        content = json.loads(response)
-        return content['id']
+        return self.upload_file('/files', file, filename=filename, fields={'type': 'voucher'}).file_id
+
+    def upload_voucher_file(self, voucher_id: str, file: UploadSource, filename: str = None) -> UploadResult:
+        """ Attach a file (e.g. the invoice PDF) to an existing voucher.
+
+        :param voucher_id: ID of the voucher
+        :param file: Path to the file, its content or a binary stream
+        :param filename: Name of the file in lexoffice (optional for paths)
+        :return: UploadResult with the ID of the uploaded file
+        """
+        return self.upload_file(f'/vouchers/{voucher_id}/files', file, filename=filename)
 
     def create_voucher(self,
                        type: VoucherType,
@@ -132,22 +462,15 @@ class LexofficeClient:
                        use_collective_contact: bool,
                        contact_id: str,
                        voucher_items: list[dict],
-                       file_path: str = None) -> str:
+                       file_path: str = None,
+                       file: UploadSource = None,
+                       filename: str = None) -> str:
         # Create Voucher
-        response = requests.post(
-            url=f'{self.url}/vouchers',
-            headers=self.headers,
-            json={
-                'type': type,
-                'voucherNumber': voucher_number,
-                'voucherDate': voucher_date,
-                'totalGrossAmount': total_gross_amount,
-                'totalTaxAmount': total_tax_amount,
-                'taxType': tax_type,
-                'useCollectiveContact': use_collective_contact,
-                'contactId': contact_id,
-                'voucherItems': voucher_items
-            }
+        response = self._request(
+            'POST',
+            '/vouchers',
+            json=_voucher_payload(type, voucher_number, voucher_date, total_gross_amount, total_tax_amount,
+                                  tax_type, use_collective_contact, contact_id, voucher_items)
         )
 
         # Check voucher creation status
@@ -158,33 +481,10 @@ class LexofficeClient:
         content = response.json()
         id = content['id']
 
-        # Upload PDF if file_path is given
-        if file_path:
-            c = pycurl.Curl()
-            c.setopt(c.URL, f'{self.url}/vouchers/{id}/files')
-            c.setopt(c.POST, 1)
-            c.setopt(c.HTTPHEADER, [
-                f'Authorization: Bearer {self.api_key}',
-                "Accept: application/json",
-                "Content-Type: multipart/form-data"
-            ])
-
-            c.setopt(pycurl.CAINFO, certifi.where())
-
-            with open(file_path, 'rb') as file:
-                c.setopt(c.HTTPPOST, [
-                    ("file", (
-                        c.FORM_FILE, file.name,
-                        c.FORM_FILENAME, parse.quote(file.name)
-                    ))
-                ])
-                response = c.perform_rs()
-                status_code = c.getinfo(c.RESPONSE_CODE)
-                c.close()
-
-        # Check PDF upload status
-        if status_code != 202:
-            raise LexofficeException(response, 'Error while uploading PDF to Lexoffice API')
+        # Upload PDF if a file is given
+        file = file if file is not None else file_path
+        if file is not None:
+            self.upload_voucher_file(id, file, filename=filename)
 
         return id
     
@@ -194,26 +494,8 @@ class LexofficeClient:
                               person: dict | None, 
                               email: str = None, 
                               version: int = 0) -> str:
-        self.headers['Content-Type'] = 'application/json'
-
-        # Get name of contact
-        if company:
-            name = company['name']
-        elif person:
-            name = f'{person["firstName"]}{person["lastName"]}'
-        else:
-            raise ValueError('Either company or person must be given')
-
         # Get contact by name
-        response = requests.get(
-            url=f'{self.url}/contacts',
-            headers=self.headers,
-            params={
-                'name': name,
-                'customer': 'customer' in roles,
-                'vendor': 'vendor' in roles
-            }
-        )
+        response = self._request('GET', '/contacts', params=_contact_query(roles, company, person))
         if response.status_code != 200:
             raise LexofficeException(response, 'Error while getting contacts in Lexoffice API')
         contacts = response.json()
@@ -223,16 +505,10 @@ class LexofficeClient:
             return contacts['content'][0]['id']
         
         # Create new contact if it does not exist
-        response = requests.post(
-            url=f'{self.url}/contacts',
-            headers=self.headers,
-            json={
-                'roles': roles,
-                'company': company,
-                'person': person,
-                'email': email,
-                'version': version
-            }
+        response = self._request(
+            'POST',
+            '/contacts',
+            json=_contact_payload(roles, company, person, email, version)
         )
         if response.status_code != 200:
             raise LexofficeException(response, 'Error while creating or contact in Lexoffice API')
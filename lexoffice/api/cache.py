@@ -0,0 +1,68 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """ Small thread-safe least-recently-used cache. """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """ JSON cache in Redis, shared by all processes using the same prefix. """
+
+    def __init__(self, redis, prefix: str | bytes, ttl: int = 7 * 24 * 3600):
+        self.redis = redis
+        self.prefix = prefix.decode() if isinstance(prefix, bytes) else prefix
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        try:
+            value = self.redis.get(f'{self.prefix}{key}')
+        except Exception:
+            return default
+        return json.loads(value) if value is not None else default
+
+    def set(self, key, value):
+        try:
+            self.redis.set(f'{self.prefix}{key}', json.dumps(value), ex=self.ttl)
+        except Exception:
+            pass
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        try:
+            self.redis.delete(f'{self.prefix}{key}')
+        except Exception:
+            pass
+        return value
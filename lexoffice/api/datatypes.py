@@ -1,4 +1,6 @@
 import enum
+import functools
+import sys
 from datetime import datetime
 import uuid
 
@@ -37,186 +39,301 @@ class TaxType(enum.Enum):
     NET = "net"
     GROSS = "gross"
 
-class Address:
-    contact_id: uuid.uuid4
-    name: str
-    supplement: str
-    street: str
-    city: str
-    zip: int
-    countryCode: str
+class _field:
+    """ Attribute read straight from the raw dict of a record.
 
-    def __init__(self, address: dict):
-        try:
-            self.contact_id = uuid.UUID(address.get('contactId'))
-        except TypeError:
-            self.contact_id = None
-        self.name = address.get('name')
-        self.supplement = address.get('supplement')
-        self.street = address.get('street')
-        self.city = address.get('city')
-        try:
-            self.zip = int(address.get('zip'))
-        except (ValueError, TypeError):
-            self.zip = 0
-            pass
-        self.countryCode = address.get('countryCode')
-
-class UnitPrice:
-    currency: str
-    net_amount: float
-    gross_amount: float
-    tax_rate_percentage: int
-
-    def __init__(self, unit_price: dict):
-        self.currency = unit_price.get('currency')
-        self.net_amount = unit_price.get('netAmount')
-        self.gross_amount = unit_price.get('grossAmount')
-        self.tax_rate_percentage = unit_price.get('taxRatePercentage')
-
-class TotalPrice:
-    currency: str
-    total_net_amount: float
-    total_gross_amount: float
-    total_tax_amount: float
-    total_discount_absolute: float
-    total_discount_percentage: float
-
-    def __init__(self, total_price: dict):
-        self.currency = total_price.get('currency')
-        self.total_net_amount = total_price.get('totalNetAmount')
-        self.total_gross_amount = total_price.get('totalGrossAmount')
-        self.total_tax_amount = total_price.get('totalTaxAmount')
-        self.total_discount_absolute = total_price.get('totalDiscountAbsolute')
-        self.total_discount_percentage = total_price.get('totalDiscountPercentage')
-
-class LineItem:
-    id: uuid.uuid4
-    type: Type
-    name: str
-    description: str
-    quantity: int
-    unit_name: str
-    unit_price: UnitPrice
-    discount_percentage: float
-    line_item_amount: float
-
-    def __init__(self, line_item: dict):
-        try:
-            self.id = uuid.UUID(line_item.get('id'))
-        except TypeError:
-            self.id = None
-        try:
-            self.type = Type(line_item.get('type'))
-        except ValueError:
-            self.type = Type.UNDEFINED
-        self.name = line_item.get('name')
-        self.description = line_item.get('description')
-        if self.type == Type.MATERIAL or self.type == Type.CUSTOM:
-            self.quantity = line_item.get('quantity')
-            self.unit_name = line_item.get('unitName')
-            self.unit_price = UnitPrice(line_item.get('unitPrice'))
-            self.discount_percentage = line_item.get('discountPercentage')
-            self.line_item_amount = line_item.get('lineItemAmount')
-
-
-class Invoice:
-    id: uuid.uuid4
-    organization_id: uuid.uuid4
-    created_date: datetime
-    updated_date: datetime
-    version: int
-    language: str
-    archived: bool
-    voucher_status: VoucherStatus
-    voucher_number: str
-    voucher_date: datetime
-    due_date: datetime = None
-    address: Address
-    line_items: list[LineItem]
-    total_price: TotalPrice
-
-    def __init__(self, invoice: dict):
-        try:
-            self.id = uuid.UUID(invoice.get('id'))
-        except TypeError:
-            self.id = None
+    The optional decoder is only applied by _Record.decode, e.g. sys.intern, so repeated
+    strings (currencies, contacts) share one object.
+    """
+    __slots__ = ('key', 'decode')
+
+    def __init__(self, key: str, decode=None):
+        self.key = key
+        self.decode = decode
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return obj._raw.get(self.key)
+
+    def __set__(self, obj, value):
+        obj._raw[self.key] = value
+
+
+class _lazy:
+    """ Attribute decoded from the raw dict on first access.
+
+    The decoded value is cached in the slot named like the attribute with a leading
+    underscore, which the record class has to declare in its __slots__.
+    _Record.decode uses the eager decoder instead if given (e.g. to decode nested records in one pass too).
+    """
+    __slots__ = ('key', 'decode', 'eager', 'cache')
+
+    def __init__(self, key: str, decode, eager=None):
+        self.key = key
+        self.decode = decode
+        self.eager = eager or decode
+
+    def __set_name__(self, owner, name):
+        self.cache = owner.__dict__[f'_{name}']
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
         try:
-            self.organization_id = uuid.UUID(invoice.get('organizationId'))
-        except TypeError:
-            self.organization_id = None
-        self.created_date = datetime.fromisoformat(invoice.get('createdDate'))
-        self.updated_date = datetime.fromisoformat(invoice.get('updatedDate'))
-        self.version = invoice.get('version')
-        self.language = invoice.get('language')
-        self.archived = invoice.get('archived')
-        self.voucher_status = invoice.get('voucherStatus')
-        self.voucher_number = invoice.get('voucherNumber')
-        if 'dueDate' in invoice and invoice.get('dueDate') is not None:
-            self.due_date = datetime.fromisoformat(invoice.get('dueDate'))
-        self.voucher_date = datetime.fromisoformat(invoice.get('voucherDate'))
-        self.address = Address(invoice.get('address'))
-        self.line_items = []
-        for item in invoice.get('lineItems'):
-            self.line_items.append(LineItem(item))
-        self.total_price = TotalPrice(invoice.get('totalPrice'))
-
-class Voucher:
-    id: uuid.uuid4
-    voucher_type: VoucherType
-    voucher_status: VoucherStatus
-    voucher_number: str
-    voucher_date: datetime
-    created_date: datetime
-    updated_date: datetime
-    due_date: datetime = None
-    contact_id: uuid.uuid4
-    contact_name: str
-    total_amount: float
-    open_amount: float
-    currency: str
-    archived: bool
-
-    def __init__(self, voucher: dict):
+            return self.cache.__get__(obj, owner)
+        except AttributeError:
+            value = self.decode(obj._raw.get(self.key))
+            self.cache.__set__(obj, value)
+            return value
+
+    def __set__(self, obj, value):
+        self.cache.__set__(obj, value)
+
+
+class _Record:
+    """ Compact view of an API object that keeps the raw dict for round-tripping.
+
+    Attributes are decoded on first access, which is cheapest if only a few of them are read.
+    decode() decodes all attributes in one pass instead, which is faster if most are read.
+    """
+    __slots__ = ('_raw',)
+    # Set by __init_subclass__: class of records decoded in one pass, (setter, key) of its plain
+    # attributes and (setter, key, decoder) of the others
+    _decoded: type = None
+    _fields: tuple = ()
+    _decoders: tuple = ()
+    _eager: bool = False
+
+    def __init__(self, data: dict):
+        self._raw = data if data is not None else {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get('_eager'):
+            return
+
+        # Subclass keeping every attribute in a plain slot, which is much faster to read than the descriptors
+        attributes = {name: value for name, value in cls.__dict__.items() if isinstance(value, (_field, _lazy))}
+        cls._decoded = type(f'Decoded{cls.__name__}', (cls,), {
+            '__slots__': tuple(attributes),
+            '__module__': cls.__module__,
+            '__getattr__': _decode_failed,
+            '__setattr__': _set_decoded,
+            '_eager': True,
+        })
+        # Registered in the module like the record class, so decoded records can be pickled (e.g. for frappe.enqueue)
+        setattr(sys.modules[cls.__module__], cls._decoded.__name__, cls._decoded)
+        schema = [
+            (cls._decoded.__dict__[name].__set__, attribute.key,
+             attribute.eager if isinstance(attribute, _lazy) else attribute.decode)
+            for name, attribute in attributes.items()
+        ]
+        cls._fields = tuple((set_value, key) for set_value, key, decode in schema if decode is None)
+        cls._decoders = tuple(entry for entry in schema if entry[2] is not None)
+
+    @classmethod
+    def decode(cls, data: dict):
+        """ Decode a record with all its attributes in one pass.
+
+        Attributes that can't be decoded raise their error on access, as with lazy decoding.
+        Setting attributes works as on lazily decoded records: plain ones are written back to its dict.
+
+        :param data: Raw dict of the record (as returned by the API)
+        :return: Instance of (a subclass of) this record class
+        """
+        record = cls._decoded.__new__(cls._decoded)
+        data = data if data is not None else {}
+        _set_raw(record, data)
+        get = data.get
+        for set_value, key in cls._fields:
+            set_value(record, get(key))
+        for set_value, key, decode in cls._decoders:
+            try:
+                set_value(record, decode(get(key)))
+            except (ValueError, TypeError):
+                pass
+        return record
+
+    def to_dict(self) -> dict:
+        return self._raw
+
+    def __getstate__(self):
+        # Pickle the slots that are set only: reading an unset attribute of a decoded record
+        # raises its decoding error
+        state = {}
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                try:
+                    state[name] = cls.__dict__[name].__get__(self)
+                except AttributeError:
+                    pass
+        return None, state
+
+    def __setstate__(self, state):
+        # Slots are restored as they were, without writing plain attributes of decoded records
+        # back to the dict
+        for name, value in state[1].items():
+            object.__setattr__(self, name, value)
+
+
+_set_raw = _Record.__dict__['_raw'].__set__
+
+def _set_decoded(record, name, value):
+    # Plain attributes of a decoded record are written back to its dict, as by _field
+    object.__setattr__(record, name, value)
+    attribute = getattr(type(record).__mro__[1], name, None)
+    if isinstance(attribute, _field):
+        record._raw[attribute.key] = value
+
+def _decode_failed(record, name):
+    # Only called for attributes decode() left unset: decode them lazily, which raises the error
+    attribute = getattr(type(record).__mro__[1], name, None)
+    if not isinstance(attribute, (_field, _lazy)):
+        raise AttributeError(f'{type(record).__name__!r} object has no attribute {name!r}')
+    return attribute.__get__(record, type(record))
+
+
+def _uuid(value) -> uuid.UUID | None:
+    return uuid.UUID(value) if value is not None else None
+
+# IDs repeated across records (e.g. of contacts) are parsed once
+_cached_uuid = functools.lru_cache(maxsize=4096)(_uuid)
+
+def _enum(enum_class: type[enum.Enum]):
+    """ Decoder of enum members by value, with a dict lookup instead of the much slower Enum call. """
+    members = {member.value: member for member in enum_class}
+
+    def decode(value):
         try:
-            self.id = uuid.UUID(voucher.get('id'))
-        except TypeError:
-            self.id = None
-        self.voucher_type = VoucherType(voucher.get('voucherType'))
-        self.voucher_status = VoucherStatus(voucher.get('voucherStatus'))
-        self.voucher_number = voucher.get('voucherNumber')
-        self.voucher_date = datetime.fromisoformat(voucher.get('voucherDate'))
-        self.created_date = datetime.fromisoformat(voucher.get('createdDate'))
-        self.updated_date = datetime.fromisoformat(voucher.get('updatedDate'))
-        if 'dueDate' in voucher and voucher.get('dueDate') is not None:
-            self.due_date = datetime.fromisoformat(voucher.get('dueDate'))
-        self.contact_id = voucher.get('contactId')
-        self.contact_name = voucher.get('contactName')
-        self.total_amount = voucher.get('totalAmount')
-        self.open_amount = voucher.get('openAmount')
-        self.currency = voucher.get('currency')
-        self.archived = voucher.get('archived')
-
-class VoucherList:
-    content: list[Voucher]
-    first: bool
-    last: bool
-    total_pages: int
-    total_elements: int
-    number_of_elements: int
-    size: int
-    number: int
-    sort: list
-
-    def __init__(self, voucher_list: dict):
-        self.content = []
-        for voucher in voucher_list.get('content'):
-            self.content.append(Voucher(voucher))
-        self.first = voucher_list.get('first')
-        self.last = voucher_list.get('last')
-        self.total_pages = voucher_list.get('totalPages')
-        self.total_elements = voucher_list.get('totalElements')
-        self.number_of_elements = voucher_list.get('numberOfElements')
-        self.size = voucher_list.get('size')
-        self.number = voucher_list.get('number')
-        self.sort = voucher_list.get('sort')
+            return members[value]
+        except (KeyError, TypeError):
+            # Raises ValueError for unknown values
+            return enum_class(value)
+    return decode
+
+def _datetime(value) -> datetime | None:
+    return datetime.fromisoformat(value) if value is not None else None
+
+def _int_or_zero(value) -> int:
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
+
+_voucher_type = _enum(VoucherType)
+_voucher_status = _enum(VoucherStatus)
+_line_item_type = _enum(Type)
+
+def _type(value) -> Type:
+    try:
+        return _line_item_type(value)
+    except ValueError:
+        return Type.UNDEFINED
+
+
+class Address(_Record):
+    __slots__ = ('_contact_id', '_zip')
+
+    contact_id: uuid.UUID = _lazy('contactId', _cached_uuid)
+    name: str = _field('name', sys.intern)
+    supplement: str = _field('supplement')
+    street: str = _field('street')
+    city: str = _field('city')
+    zip: int = _lazy('zip', _int_or_zero)
+    countryCode: str = _field('countryCode', sys.intern)
+
+class UnitPrice(_Record):
+    __slots__ = ()
+
+    currency: str = _field('currency', sys.intern)
+    net_amount: float = _field('netAmount')
+    gross_amount: float = _field('grossAmount')
+    tax_rate_percentage: int = _field('taxRatePercentage')
+
+class TotalPrice(_Record):
+    __slots__ = ()
+
+    currency: str = _field('currency', sys.intern)
+    total_net_amount: float = _field('totalNetAmount')
+    total_gross_amount: float = _field('totalGrossAmount')
+    total_tax_amount: float = _field('totalTaxAmount')
+    total_discount_absolute: float = _field('totalDiscountAbsolute')
+    total_discount_percentage: float = _field('totalDiscountPercentage')
+
+class LineItem(_Record):
+    __slots__ = ('_id', '_type', '_unit_price')
+
+    id: uuid.UUID = _lazy('id', _uuid)
+    type: Type = _lazy('type', _type)
+    name: str = _field('name')
+    description: str = _field('description')
+    # Only set for material and custom line items
+    quantity: int = _field('quantity')
+    unit_name: str = _field('unitName', sys.intern)
+    unit_price: UnitPrice = _lazy('unitPrice', lambda value: UnitPrice(value) if value is not None else None,
+                                  lambda value: UnitPrice.decode(value) if value is not None else None)
+    discount_percentage: float = _field('discountPercentage')
+    line_item_amount: float = _field('lineItemAmount')
+
+
+class Invoice(_Record):
+    __slots__ = ('_id', '_organization_id', '_created_date', '_updated_date', '_voucher_date', '_due_date',
+                 '_address', '_line_items', '_total_price')
+
+    id: uuid.UUID = _lazy('id', _uuid)
+    organization_id: uuid.UUID = _lazy('organizationId', _uuid)
+    created_date: datetime = _lazy('createdDate', _datetime)
+    updated_date: datetime = _lazy('updatedDate', _datetime)
+    version: int = _field('version')
+    language: str = _field('language', sys.intern)
+    archived: bool = _field('archived')
+    voucher_status: VoucherStatus = _field('voucherStatus')
+    voucher_number: str = _field('voucherNumber')
+    voucher_date: datetime = _lazy('voucherDate', _datetime)
+    due_date: datetime = _lazy('dueDate', _datetime)
+    address: Address = _lazy('address', Address, Address.decode)
+    line_items: list[LineItem] = _lazy('lineItems', lambda value: [LineItem(item) for item in value or []],
+                                       lambda value: [LineItem.decode(item) for item in value or []])
+    total_price: TotalPrice = _lazy('totalPrice', TotalPrice, TotalPrice.decode)
+
+class Voucher(_Record):
+    __slots__ = ('_id', '_voucher_type', '_voucher_status', '_voucher_date', '_created_date', '_updated_date',
+                 '_due_date')
+
+    id: uuid.UUID = _lazy('id', _uuid)
+    voucher_type: VoucherType = _lazy('voucherType', _voucher_type)
+    voucher_status: VoucherStatus = _lazy('voucherStatus', _voucher_status)
+    voucher_number: str = _field('voucherNumber')
+    voucher_date: datetime = _lazy('voucherDate', _datetime)
+    created_date: datetime = _lazy('createdDate', _datetime)
+    updated_date: datetime = _lazy('updatedDate', _datetime)
+    due_date: datetime = _lazy('dueDate', _datetime)
+    contact_id: str = _field('contactId', sys.intern)
+    contact_name: str = _field('contactName', sys.intern)
+    total_amount: float = _field('totalAmount')
+    open_amount: float = _field('openAmount')
+    currency: str = _field('currency', sys.intern)
+    archived: bool = _field('archived')
+
+class VoucherList(_Record):
+    __slots__ = ('_content',)
+
+    content: list[Voucher] = _lazy('content', lambda value: [Voucher(voucher) for voucher in value or []],
+                                   lambda value: [Voucher.decode(voucher) for voucher in value or []])
+    first: bool = _field('first')
+    last: bool = _field('last')
+    total_pages: int = _field('totalPages')
+    total_elements: int = _field('totalElements')
+    number_of_elements: int = _field('numberOfElements')
+    size: int = _field('size')
+    number: int = _field('number')
+    sort: list = _field('sort')
+
+    def __iter__(self):
+        """ Iterate over the vouchers without building the content list (unless decoded already). """
+        if self._eager:
+            yield from self.content
+            return
+        for voucher in self._raw.get('content') or []:
+            yield Voucher(voucher)
@@ -0,0 +1,18 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson else 'json'
+
+
+def loads(data: bytes | str):
+    """ Decode a JSON response body, with orjson if it is installed (about twice as fast).
+
+    :param data: Raw body of the response (bytes are decoded without copying them to a str first)
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -1,15 +1,53 @@
+import json
+
 from requests import Response
+from requests.exceptions import ConnectionError, Timeout
+
+try:
+    import httpx
+except ImportError:  # optional dependency
+    httpx = None
+
+# Responses worth retrying later: throttled, timed out or server errors
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+TRANSIENT_ERRORS = (ConnectionError, Timeout) + ((httpx.TransportError,) if httpx else ())
 
 
 class LexofficeException(Exception):
     msg: str
+    status_code: int
+    body: dict | list | None
 
     def __init__(self, response: Response, message: str):
-        super().__init__(message)
-        status_code = response.status_code
-        body = response.json()
-        self.msg = f"status={status_code}, msg={body['message']}"
-        print(self.msg)
-
-    def msg(self):
-        return self.msg
\ No newline at end of file
+        self.status_code = response.status_code
+        try:
+            self.body = response.json()
+        except ValueError:
+            # e.g. HTML error page of a proxy
+            self.body = None
+
+        if isinstance(self.body, dict) and self.body.get('message'):
+            detail = self.body['message']
+        elif self.body is not None:
+            detail = json.dumps(self.body)[:1000]
+        else:
+            detail = response.text[:1000]
+        self.msg = f"status={self.status_code}, msg={detail}"
+        super().__init__(f'{message}: {self.msg}')
+
+    @property
+    def transient(self) -> bool:
+        """ True if the request may succeed if retried later. """
+        return self.status_code in TRANSIENT_STATUS_CODES
+
+
+def is_transient(error: Exception) -> bool:
+    """ Classify an error of an API call.
+
+    :return: True for network errors and throttled or failed requests (worth retrying later),
+        False for errors that will happen again (validation errors, bugs)
+    """
+    if isinstance(error, LexofficeException):
+        return error.transient
+    return isinstance(error, TRANSIENT_ERRORS)
@@ -0,0 +1,33 @@
+import re
+
+_ID_PATTERN = re.compile(r'/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE)
+
+
+class RequestMetrics:
+    """ Receiver of the measurements of a client's API calls.
+
+    This base class discards them. Subclasses record them, e.g. to export them to Prometheus.
+    All methods may be called from several threads at once.
+    """
+
+    def observe_request(self, method: str, endpoint: str, status: int | str, seconds: float):
+        """ Called after every attempt of a request.
+
+        :param endpoint: Path with IDs replaced by {id} (see get_endpoint)
+        :param status: HTTP status code or 'error' if no response was received
+        :param seconds: Duration of the attempt (without waiting for the rate limiter)
+        """
+
+    def count_retry(self, method: str, endpoint: str, reason: str):
+        """ Called before a request is retried.
+
+        :param reason: HTTP status code of the failed attempt or 'connection'
+        """
+
+    def count_upload(self, endpoint: str, bytes_sent: int):
+        """ Called after a file was uploaded successfully. """
+
+
+def get_endpoint(path: str) -> str:
+    """ Path of a request with IDs replaced, e.g. '/vouchers/{id}/files'. """
+    return _ID_PATTERN.sub('/{id}', path)
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# lexoffice allows 2 requests per second per API key
+DEFAULT_RATE = 2.0
+
+
+class TokenBucket:
+    """ In-process token bucket, shared by all threads of a process.
+
+    Callers reserve a token and wait until it becomes available, so concurrent callers
+    are spaced out evenly at the configured rate instead of bursting into 429s.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """ Reserve tokens.
+
+        :param tokens: Number of tokens to reserve
+        :return: Seconds to wait until the reserved tokens are available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens: float = 1):
+        """ Block until the requested tokens are available. """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RedisTokenBucket(TokenBucket):
+    """ Token bucket kept in Redis, shared by all workers using the same key.
+
+    Falls back to the in-process bucket while Redis is not reachable.
+    """
+
+    SCRIPT = """
+        if redis.replicate_commands then redis.replicate_commands() end
+        local rate = tonumber(ARGV[1])
+        local capacity = tonumber(ARGV[2])
+        local requested = tonumber(ARGV[3])
+        local t = redis.call('TIME')
+        local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - requested
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+        redis.call('EXPIRE', KEYS[1], 60 + math.ceil(math.max(0, -tokens) / rate))
+        if tokens < 0 then
+            return tostring(-tokens / rate)
+        end
+        return '0'
+    """
+
+    def __init__(self, redis, key: str, rate: float = DEFAULT_RATE, capacity: float = None):
+        super().__init__(rate, capacity)
+        self.redis = redis
+        self.key = key
+        self._script = redis.register_script(self.SCRIPT)
+
+    def reserve(self, tokens: float = 1) -> float:
+        try:
+            wait = self._script(keys=[self.key], args=[self.rate, self.capacity, tokens])
+        except Exception:
+            return super().reserve(tokens)
+        return float(wait)
+
+
+class RedisSemaphore:
+    """ Counting semaphore kept in Redis, shared by all workers using the same key.
+
+    Every holder is a member of a sorted set scored by the time it acquired its slot. Slots
+    of holders that crashed without releasing expire after ttl seconds. While Redis is not
+    reachable, acquire() always succeeds.
+    """
+
+    SCRIPT = """
+        if redis.replicate_commands then redis.replicate_commands() end
+        local limit = tonumber(ARGV[1])
+        local ttl = tonumber(ARGV[2])
+        local t = redis.call('TIME')
+        local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+        redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - ttl)
+        if redis.call('ZCARD', KEYS[1]) < limit then
+            redis.call('ZADD', KEYS[1], now, ARGV[3])
+            redis.call('EXPIRE', KEYS[1], math.ceil(ttl))
+            return 1
+        end
+        return 0
+    """
+
+    def __init__(self, redis, key: str, limit: int, ttl: float = 600.0):
+        self.redis = redis
+        self.key = key
+        self.limit = limit
+        self.ttl = ttl
+        self._script = redis.register_script(self.SCRIPT)
+
+    def acquire(self, timeout: float = None, poll_interval: float = 0.5) -> str | None:
+        """ Acquire a slot, waiting up to timeout seconds for one to become free.
+
+        :return: Token to release the slot with, or None if no slot became free in time
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            try:
+                if int(self._script(keys=[self.key], args=[self.limit, self.ttl, token])):
+                    return token
+            except Exception:
+                return token
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def release(self, token: str):
+        try:
+            self.redis.zrem(self.key, token)
+        except Exception:
+            pass
+
+
+def get_retry_after(response: requests.Response) -> float | None:
+    """ Get the delay requested by the Retry-After header of a response.
+
+    :return: Delay in seconds or None if the header is missing or invalid
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_backoff(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """ Exponential backoff with full jitter for the given (0-based) retry attempt. """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
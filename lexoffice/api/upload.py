@@ -0,0 +1,141 @@
+import io
+import os
+import uuid
+from typing import BinaryIO, Union
+from urllib import parse
+
+UploadSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+
+class UploadResult:
+    file_id: str
+    filename: str
+    bytes_sent: int
+    elapsed: float
+    status_code: int
+
+    def __init__(self, file_id: str, filename: str, bytes_sent: int, elapsed: float, status_code: int):
+        self.file_id = file_id
+        self.filename = filename
+        self.bytes_sent = bytes_sent
+        self.elapsed = elapsed
+        self.status_code = status_code
+
+    def __repr__(self):
+        return f'<UploadResult {self.filename}: {self.bytes_sent} bytes in {self.elapsed:.3f}s>'
+
+
+class MultipartBody(io.RawIOBase):
+    """ Streaming multipart/form-data request body.
+
+    The file part is read in chunks straight from the file on disk, the in-memory buffer
+    (without copying it) or the given binary stream while the request is being sent.
+    The body knows its length up front, so it is sent with a Content-Length header and
+    can be rewound with seek(0) to send it again (e.g. on retry).
+    """
+
+    def __init__(self, source: UploadSource, filename: str = None, fields: dict = None,
+                 file_field: str = 'file', content_type: str = 'application/pdf'):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self._owns_stream = False
+
+        if isinstance(source, (str, os.PathLike)):
+            stream = open(source, 'rb')
+            self._owns_stream = True
+            filename = filename or os.path.basename(source)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            stream = None
+            data = memoryview(source).cast('B')
+        else:
+            stream = source
+            filename = filename or os.path.basename(getattr(source, 'name', '') or '')
+
+        self.filename = filename or 'voucher.pdf'
+
+        head = b''
+        for name, value in (fields or {}).items():
+            head += (
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n'
+            ).encode()
+        head += (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{file_field}"; filename="{parse.quote(self.filename)}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+        tail = f'\r\n--{self.boundary}--\r\n'.encode()
+
+        if stream is None:
+            file_segment = (data, 0, len(data))
+        else:
+            start = stream.tell()
+            end = stream.seek(0, os.SEEK_END)
+            stream.seek(start)
+            file_segment = (stream, start, end - start)
+
+        # (buffer or stream, offset, length) of each part of the body
+        self._segments = [
+            (memoryview(head), 0, len(head)),
+            file_segment,
+            (memoryview(tail), 0, len(tail)),
+        ]
+        self._length = sum(length for _, _, length in self._segments)
+        self._pos = 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        self.seek(0)
+        while chunk := self.read(64 * 1024):
+            yield chunk
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._length
+        self._pos = max(0, min(offset, self._length))
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = []
+            while chunk := self.read(self._length - self._pos):
+                chunks.append(chunk)
+            return b''.join(chunks)
+        segment_start = 0
+        for part, offset, length in self._segments:
+            if self._pos < segment_start + length:
+                relative = self._pos - segment_start
+                count = min(size, length - relative)
+                if isinstance(part, memoryview):
+                    chunk = part[offset + relative:offset + relative + count]
+                else:
+                    part.seek(offset + relative)
+                    chunk = part.read(count)
+                self._pos += len(chunk)
+                return chunk
+            segment_start += length
+        return b''
+
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+    def close(self):
+        if self._owns_stream and not self.closed:
+            self._segments[1][0].close()
+        super().close()
@@ -0,0 +1,120 @@
+import json
+from typing import Iterator
+
+import frappe
+
+from .documents import DOCUMENT_TYPES
+from .mapping import CategoryMap
+from .metrics import get_metrics
+from .pipeline import PipelineResult, UploadPipeline
+from .retry import defer_failure
+from .tasks import record_result, submit_document
+
+DEFAULT_CHUNK_SIZE = 500
+CHECKPOINT_KEY = 'lexoffice_backfill'
+
+
+class BackfillProgress:
+    chunks: int = 0
+    completed: int = 0
+    failed: int = 0
+    checkpoint: list = None
+
+    def add(self, result: PipelineResult):
+        if result.error:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+
+def backfill(doctype: str, from_date=None, to_date=None, chunk_size: int = DEFAULT_CHUNK_SIZE, restart: bool = False) -> Iterator[BackfillProgress]:
+    """
+    Upload the submitted documents of a doctype that were never synced completely.
+
+    Documents are read in chunks ordered by (posting_date, name) and uploaded through the
+    upload pipeline (bounded number of documents in flight). After every chunk the position
+    is saved, so an interrupted run with the same arguments resumes after the last chunk.
+    Documents already synced according to the sync ledger are skipped.
+
+    :param from_date: Only documents posted on or after this date
+    :param to_date: Only documents posted on or before this date
+    :param restart: Ignore the saved position and start from the beginning
+    :return: Iterator yielding the progress after every chunk
+    """
+    if doctype not in DOCUMENT_TYPES:
+        frappe.throw(f'Uploads of {doctype} are not supported')
+
+    settings = frappe.get_single('Lexoffice Settings')
+    # Fail before the first upload if the settings can't map the documents (see CategoryMap)
+    CategoryMap(settings, doctype)
+    api = settings.get_client()
+    checkpoint_key = f'{CHECKPOINT_KEY}:{doctype}:{from_date or ""}:{to_date or ""}'
+    progress = BackfillProgress()
+    progress.checkpoint = None if restart else json.loads(frappe.db.get_global(checkpoint_key) or 'null')
+
+    # Documents in flight are bounded by the pipeline's pools (see UploadPipeline),
+    # Max. Uploads in Flight only limits single upload jobs
+    with UploadPipeline(api, render_processes=settings.render_processes, upload_threads=settings.upload_threads) as pipeline:
+        while True:
+            chunk = get_unsynced_documents(doctype, from_date, to_date, chunk_size, after=progress.checkpoint)
+            if not chunk:
+                break
+
+            documents = {}
+            for row in chunk:
+                document = documents[row.name] = frappe._dict(key=row.name, doctype=doctype, name=row.name)
+                result = submit_document(document, pipeline, api)
+                if result:
+                    finish_document(document, result, progress)
+                for result in pipeline.results():
+                    finish_document(documents[result.key], record_result(result, documents[result.key], settings), progress)
+
+            for result in pipeline.results(wait=True):
+                finish_document(documents[result.key], record_result(result, documents[result.key], settings), progress)
+
+            progress.chunks += 1
+            progress.checkpoint = [str(chunk[-1].posting_date), chunk[-1].name]
+            frappe.db.set_global(checkpoint_key, json.dumps(progress.checkpoint))
+            frappe.db.commit()
+            get_metrics().flush()
+            yield progress
+
+    frappe.db.set_global(checkpoint_key, None)
+    frappe.db.commit()
+
+def finish_document(document, result: PipelineResult, progress: BackfillProgress):
+    # Failed documents are retried by the upload queue or parked, the backfill moves on
+    if result.error:
+        defer_failure(document.doctype, document.name, result.error, result.transient, payload=document.get('voucher_data'))
+        frappe.db.commit()
+    progress.add(result)
+
+def get_unsynced_documents(doctype: str, from_date=None, to_date=None, limit: int = DEFAULT_CHUNK_SIZE, after: list = None) -> list:
+    """
+    Next chunk of submitted documents without a completed sync ledger entry, after the
+    (posting_date, name) position (keyset pagination, no offset).
+    """
+    conditions = []
+    if from_date:
+        conditions.append('doc.posting_date >= %(from_date)s')
+    if to_date:
+        conditions.append('doc.posting_date <= %(to_date)s')
+    if after:
+        conditions.append('(doc.posting_date > %(after_date)s or (doc.posting_date = %(after_date)s and doc.name > %(after_name)s))')
+
+    return frappe.db.sql("""
+        select doc.name, doc.posting_date
+        from `tab{doctype}` doc
+        left join `tabLexoffice Sync Ledger` ledger
+            on ledger.name = concat(%(doctype)s, '::', doc.name) and ledger.status = 'Completed'
+        where doc.docstatus = 1 and ledger.name is null {conditions}
+        order by doc.posting_date asc, doc.name asc
+        limit %(limit)s
+    """.format(doctype=doctype, conditions=''.join(f' and {c}' for c in conditions)), {
+        'doctype': doctype,
+        'from_date': from_date,
+        'to_date': to_date,
+        'after_date': after[0] if after else None,
+        'after_name': after[1] if after else None,
+        'limit': limit
+    }, as_dict=True)
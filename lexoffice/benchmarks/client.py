@@ -0,0 +1,137 @@
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from ..api.api import DEFAULT_MAX_RETRIES, LexofficeClient
+from ..api.datatypes import VoucherType
+from ..api.metrics import RequestMetrics
+from ..api.ratelimit import TokenBucket
+from .data import get_id
+from .result import BenchmarkResult
+from .server import MockLexofficeServer, MockOptions
+
+# Synthetic PDF uploaded with every voucher
+PDF_SIZE = 64 * 1024
+
+
+class CallCounter(RequestMetrics):
+    """
+    Counts the HTTP attempts and retries of a benchmarked client.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def observe_request(self, method, endpoint, status, seconds):
+        with self._lock:
+            self.calls += 1
+
+    def count_retry(self, method, endpoint, reason):
+        with self._lock:
+            self.retries += 1
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.retries = 0
+
+
+def get_benchmark_client(url: str, pool_size: int, rate: float = None, max_retries: int = DEFAULT_MAX_RETRIES) -> LexofficeClient:
+    """
+    Client talking to the mock server.
+
+    :param rate: Requests per second of the client's token bucket (None for no throttling)
+    """
+    client = LexofficeClient('benchmark', pool_size=pool_size, max_retries=max_retries, metrics=CallCounter())
+    client.url = url
+    client.rate_limiter = TokenBucket(rate) if rate else None
+    return client
+
+def get_synthetic_pdf(size: int = PDF_SIZE) -> bytes:
+    head = b'%PDF-1.4\n'
+    return head + b'0' * max(size - len(head), 0)
+
+def run_client_benchmark(options: MockOptions, requests: int = 200, threads: int = 4, client_rate: float = None,
+                         max_retries: int = DEFAULT_MAX_RETRIES) -> tuple[list[BenchmarkResult], dict]:
+    """
+    Measure LexofficeClient against the mock server: fetching invoices, creating vouchers
+    with their PDF and paging through the voucherlist.
+
+    :param requests: Operations per benchmark (invoices fetched, vouchers created)
+    :param threads: Threads calling the client concurrently (and its connection pool size)
+    :param client_rate: Requests per second of the client's rate limiter (None for no throttling)
+    :return: Results and the number of responses of the mock server per status code
+    """
+    pdf = get_synthetic_pdf()
+
+    def get_invoice(client, index):
+        client.get_invoice(get_id('voucher', index))
+
+    def create_voucher(client, index):
+        voucher_id = client.create_voucher(
+            type=VoucherType.SALES_INVOICE.value,
+            voucher_number=f'BENCH-{index:07d}',
+            voucher_date='2024-01-01',
+            total_gross_amount=119.0,
+            total_tax_amount=19.0,
+            tax_type='net',
+            use_collective_contact=False,
+            contact_id=get_id('contact', index),
+            voucher_items=[{'amount': 100.0, 'taxAmount': 19.0, 'taxRatePercent': 19, 'categoryId': get_id('category', 0)}]
+        )
+        client.upload_voucher_file(voucher_id, pdf, filename=f'BENCH-{index:07d}.pdf')
+
+    with MockLexofficeServer(options) as server:
+        client = get_benchmark_client(server.url, threads, client_rate, max_retries)
+        try:
+            results = [
+                _run_concurrently('get_invoice', client, get_invoice, requests, threads),
+                _run_concurrently('create_voucher + upload', client, create_voucher, requests, threads),
+                _run_voucherlist(client),
+            ]
+        finally:
+            client.close()
+        return results, server.stats()
+
+def _run_concurrently(name: str, client: LexofficeClient, operation, count: int, threads: int) -> BenchmarkResult:
+    client.metrics.reset()
+    first_error = []
+
+    def timed(index):
+        started = time.perf_counter()
+        try:
+            operation(client, index)
+        except Exception:
+            if not first_error:
+                first_error.append(traceback.format_exc())
+            return None
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(timed, range(count)))
+    seconds = time.perf_counter() - started
+
+    errors = latencies.count(None)
+    return BenchmarkResult(name, count - errors, seconds, [latency for latency in latencies if latency is not None], {
+        'calls/s': round(client.metrics.calls / seconds, 1) if seconds else 0,
+        'retries': client.metrics.retries,
+    }, errors=errors, first_error=first_error[0] if first_error else None)
+
+def _run_voucherlist(client: LexofficeClient) -> BenchmarkResult:
+    client.metrics.reset()
+    count = 0
+    first_error = None
+    started = time.perf_counter()
+    try:
+        for _ in client.iter_vouchers(VoucherType.SALES_INVOICE):
+            count += 1
+    except Exception:
+        first_error = traceback.format_exc()
+    seconds = time.perf_counter() - started
+    return BenchmarkResult('iter_vouchers', count, seconds, details={
+        'pages': client.metrics.calls - client.metrics.retries,
+        'retries': client.metrics.retries,
+    }, errors=1 if first_error else 0, first_error=first_error)
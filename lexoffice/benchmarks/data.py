@@ -0,0 +1,117 @@
+import uuid
+from datetime import datetime, timedelta
+
+# Synthetic records are derived from their index, so every run (and the mock server) sees the same data
+NAMESPACE = uuid.UUID('6f1c1f7e-3b7a-4c1e-9a51-0d2b6c1e4f10')
+STATUSES = ('open', 'paid', 'paidoff', 'voided', 'overdue')
+VOUCHER_TYPES = ('salesinvoice', 'salescreditnote', 'invoice')
+CONTACTS = 500
+EPOCH = datetime.fromisoformat('2024-01-01T08:00:00.000+01:00')
+
+
+def get_id(kind: str, index: int) -> str:
+    return str(uuid.uuid5(NAMESPACE, f'{kind}:{index}'))
+
+def format_datetime(value: datetime) -> str:
+    # lexoffice sends milliseconds and the UTC offset, e.g. 2024-01-01T08:00:00.000+01:00
+    return value.isoformat(timespec='milliseconds')
+
+def make_voucher(index: int) -> dict:
+    """
+    Entry of a voucherlist page.
+    """
+    voucher_date = EPOCH + timedelta(hours=index)
+    total = round(100 + index % 997 * 1.19, 2)
+    status = STATUSES[index % len(STATUSES)]
+    return {
+        'id': get_id('voucher', index),
+        'voucherType': VOUCHER_TYPES[index % len(VOUCHER_TYPES)],
+        'voucherStatus': status,
+        'voucherNumber': f'RE{index:07d}',
+        'voucherDate': format_datetime(voucher_date),
+        'createdDate': format_datetime(voucher_date),
+        'updatedDate': format_datetime(voucher_date + timedelta(minutes=index % 60)),
+        'dueDate': format_datetime(voucher_date + timedelta(days=14)),
+        'contactId': get_id('contact', index % CONTACTS),
+        'contactName': f'Customer {index % CONTACTS}',
+        'totalAmount': total,
+        'openAmount': total if status in ('open', 'overdue') else 0,
+        'currency': 'EUR',
+        'archived': False,
+    }
+
+def make_voucherlist(total: int, page: int = 0, size: int = 250) -> dict:
+    """
+    Page of a voucherlist with `total` vouchers.
+    """
+    start = page * size
+    content = [make_voucher(index) for index in range(start, min(start + size, total))]
+    total_pages = (total + size - 1) // size
+    return {
+        'content': content,
+        'first': page == 0,
+        'last': page >= total_pages - 1,
+        'totalPages': total_pages,
+        'totalElements': total,
+        'numberOfElements': len(content),
+        'size': size,
+        'number': page,
+        'sort': [{'property': 'voucherdate', 'direction': 'DESC', 'ignoreCase': False, 'nullHandling': 'NATIVE', 'ascending': False}],
+    }
+
+def make_invoice(index: int, lines: int = 5, invoice_id: str = None) -> dict:
+    """
+    Invoice as returned by GET /invoices/{id}.
+    """
+    voucher = make_voucher(index)
+    line_items = []
+    for line in range(lines):
+        net_amount = round(10 + (index + line) % 89 * 0.5, 2)
+        line_items.append({
+            'id': get_id('item', index * 100 + line),
+            'type': ('service', 'material', 'custom')[line % 3],
+            'name': f'Item {line}',
+            'description': f'Synthetic line {line} of invoice {index}',
+            'quantity': 1 + line,
+            'unitName': 'Stück',
+            'unitPrice': {
+                'currency': 'EUR',
+                'netAmount': net_amount,
+                'grossAmount': round(net_amount * 1.19, 2),
+                'taxRatePercentage': 19,
+            },
+            'discountPercentage': 0,
+            'lineItemAmount': round(net_amount * (1 + line), 2),
+        })
+    total_net = round(sum(item['lineItemAmount'] for item in line_items), 2)
+    return {
+        'id': invoice_id or voucher['id'],
+        'organizationId': get_id('organization', 0),
+        'createdDate': voucher['createdDate'],
+        'updatedDate': voucher['updatedDate'],
+        'version': 1 + index % 4,
+        'language': 'de',
+        'archived': False,
+        'voucherStatus': voucher['voucherStatus'],
+        'voucherNumber': voucher['voucherNumber'],
+        'voucherDate': voucher['voucherDate'],
+        'dueDate': voucher['dueDate'],
+        'address': {
+            'contactId': voucher['contactId'],
+            'name': voucher['contactName'],
+            'supplement': None,
+            'street': f'Hauptstraße {index % 200 + 1}',
+            'city': 'München',
+            'zip': f'{80331 + index % 500}',
+            'countryCode': 'DE',
+        },
+        'lineItems': line_items,
+        'totalPrice': {
+            'currency': 'EUR',
+            'totalNetAmount': total_net,
+            'totalGrossAmount': round(total_net * 1.19, 2),
+            'totalTaxAmount': round(total_net * 0.19, 2),
+            'totalDiscountAbsolute': None,
+            'totalDiscountPercentage': None,
+        },
+    }
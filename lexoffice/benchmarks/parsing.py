@@ -0,0 +1,92 @@
+import json
+
+from ..api.datatypes import Invoice, Voucher, VoucherList
+from ..api.decoding import JSON_BACKEND, loads
+from .data import make_invoice, make_voucherlist
+from .result import BenchmarkResult, best_of
+
+DEFAULT_RECORDS = (10_000, 100_000)
+
+# (label, JSON decoder, decode records in one pass): the standard library with lazily decoded
+# attributes, and the client's backend (orjson if installed) with lazy and one-pass decoding
+DECODERS = (
+    ('json, lazy', json.loads, False),
+    (f'{JSON_BACKEND}, lazy', loads, False),
+    (f'{JSON_BACKEND}, eager', loads, True),
+)
+
+
+def read_voucher(voucher: Voucher) -> tuple:
+    """
+    Read every attribute of a voucher (decoding the lazy ones).
+    """
+    return (
+        voucher.id, voucher.voucher_type, voucher.voucher_status, voucher.voucher_number, voucher.voucher_date,
+        voucher.created_date, voucher.updated_date, voucher.due_date, voucher.contact_id, voucher.contact_name,
+        voucher.total_amount, voucher.open_amount, voucher.currency, voucher.archived,
+    )
+
+def read_invoice(invoice: Invoice) -> tuple:
+    """
+    Read every attribute of an invoice including its address, line items and totals.
+    """
+    address = invoice.address
+    total_price = invoice.total_price
+    return (
+        invoice.id, invoice.organization_id, invoice.created_date, invoice.updated_date, invoice.version,
+        invoice.language, invoice.archived, invoice.voucher_status, invoice.voucher_number, invoice.voucher_date,
+        invoice.due_date,
+        address.contact_id, address.name, address.street, address.city, address.zip, address.countryCode,
+        [
+            (item.id, item.type, item.name, item.quantity, item.unit_name, item.unit_price.currency,
+             item.unit_price.net_amount, item.unit_price.gross_amount, item.unit_price.tax_rate_percentage,
+             item.line_item_amount)
+            for item in invoice.line_items
+        ],
+        total_price.currency, total_price.total_net_amount, total_price.total_gross_amount, total_price.total_tax_amount,
+    )
+
+def parse_voucherlist(data: bytes, decode=json.loads, eager: bool = False) -> int:
+    """
+    Decode a voucherlist response and read all its vouchers, as the reconciliation does.
+    """
+    content = decode(data)
+    voucherlist = VoucherList.decode(content) if eager else VoucherList(content)
+    return sum(1 for voucher in voucherlist if read_voucher(voucher))
+
+def parse_invoices(responses: list[bytes], decode=json.loads, eager: bool = False) -> int:
+    """
+    Decode invoice responses (one per request) and read all their attributes.
+    """
+    make_invoice = Invoice.decode if eager else Invoice
+    return sum(1 for data in responses if read_invoice(make_invoice(decode(data))))
+
+def run_parsing_benchmark(records: tuple[int] = DEFAULT_RECORDS, repeat: int = 3, invoice_lines: int = 5) -> list[BenchmarkResult]:
+    """
+    Measure decoding voucherlists and invoices into the datatypes of the API client with
+    each decoding path (see DECODERS). The time of JSON decoding alone is reported as detail.
+
+    :param records: Numbers of vouchers and invoices to decode
+    :param repeat: Runs per measurement (the fastest one counts)
+    """
+    results = []
+    for count in records:
+        voucherlist = json.dumps(make_voucherlist(count, 0, count)).encode()
+        for label, decode, eager in DECODERS:
+            results.append(BenchmarkResult(
+                f'VoucherList {count:,} ({label})', count, best_of(repeat, parse_voucherlist, voucherlist, decode, eager),
+                details={'json': f'{best_of(repeat, decode, voucherlist):.3f}s', 'MB': round(len(voucherlist) / 1024 ** 2, 1)}
+            ))
+        del voucherlist
+
+        invoices = [json.dumps(make_invoice(index, invoice_lines)).encode() for index in range(count)]
+        for label, decode, eager in DECODERS:
+            results.append(BenchmarkResult(
+                f'Invoice {count:,} ({label})', count, best_of(repeat, parse_invoices, invoices, decode, eager),
+                details={
+                    'json': f'{best_of(repeat, lambda invoices=invoices, decode=decode: [decode(data) for data in invoices]):.3f}s',
+                    'MB': round(sum(len(data) for data in invoices) / 1024 ** 2, 1),
+                }
+            ))
+        del invoices
+    return results
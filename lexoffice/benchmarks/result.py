@@ -0,0 +1,81 @@
+import time
+
+
+class BenchmarkResult:
+    """
+    Outcome of a benchmark: number of operations, wall time and latency of each operation.
+    Failed operations are counted in errors, with the traceback of the first one.
+    """
+    name: str
+    count: int
+    seconds: float
+    latencies: list[float]
+    details: dict
+    errors: int
+    first_error: str | None
+
+    def __init__(self, name: str, count: int, seconds: float, latencies: list[float] = None, details: dict = None,
+                 errors: int = 0, first_error: str = None):
+        self.name = name
+        self.count = count
+        self.seconds = seconds
+        self.latencies = sorted(latencies or [])
+        self.details = details or {}
+        self.errors = errors
+        self.first_error = first_error
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.errors)
+
+    @property
+    def rate(self) -> float:
+        """
+        Operations per second.
+        """
+        return self.count / self.seconds if self.seconds else 0.0
+
+    def percentile(self, quantile: float) -> float | None:
+        """
+        Latency (seconds) below which the given share of operations finished (nearest rank).
+        """
+        if not self.latencies:
+            return None
+        index = min(len(self.latencies) - 1, max(0, round(quantile * len(self.latencies)) - 1))
+        return self.latencies[index]
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'count': self.count,
+            'seconds': self.seconds,
+            'rate': self.rate,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            **self.details,
+            'errors': self.errors,
+            'first_error': self.first_error,
+        }
+
+    def __str__(self):
+        text = f'{self.name}: {self.count} in {self.seconds:.3f}s ({self.rate:,.1f}/s)'
+        if self.errors:
+            text = f'FAILED {text}, {self.errors} errors'
+        if self.latencies:
+            text += f', p50 {self.percentile(0.5) * 1000:.1f} ms, p99 {self.percentile(0.99) * 1000:.1f} ms'
+        if self.details:
+            text += ', ' + ', '.join(f'{key} {value}' for key, value in self.details.items())
+        return text
+
+
+def best_of(repeat: int, function, *args) -> float:
+    """
+    Shortest wall time (seconds) of several runs of a function.
+    """
+    best = None
+    for _ in range(max(repeat, 1)):
+        started = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
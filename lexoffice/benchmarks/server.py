@@ -0,0 +1,208 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from urllib.parse import parse_qs, urlparse
+from urllib.request import urlopen
+
+from .data import get_id, make_invoice, make_voucherlist
+
+VOUCHERLIST_MAX_PAGE_SIZE = 250
+
+_INVOICE_PATH = re.compile(r'^/v1/invoices/([0-9a-f-]{36})$')
+_VOUCHER_FILES_PATH = re.compile(r'^/v1/vouchers/([0-9a-f-]{36})/files$')
+
+
+class MockOptions:
+    """
+    Behaviour of the mock lexoffice API.
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    rate: float = None
+    retry_after: int = None
+    error_rate: float = 0.0
+    vouchers: int = 1000
+    invoice_lines: int = 5
+
+    def __init__(self, latency=0.0, jitter=0.0, rate=None, retry_after=None, error_rate=0.0, vouchers=1000, invoice_lines=5):
+        # Seconds added to every response, plus a random share of up to jitter seconds
+        self.latency = latency
+        self.jitter = jitter
+        # Requests per second accepted before answering 429 (like lexoffice's limit per API key)
+        self.rate = rate
+        # Retry-After header of 429 responses (lexoffice sends none)
+        self.retry_after = retry_after
+        # Share of requests failing with 503
+        self.error_rate = error_rate
+        # Vouchers in the voucherlist and line items per invoice
+        self.vouchers = vouchers
+        self.invoice_lines = invoice_lines
+
+
+class MockLexofficeServer:
+    """
+    Local stand-in for the lexoffice API, for benchmarks without network access or API key.
+
+    Runs in a separate process, so serving requests doesn't compete with the benchmarked
+    client for the GIL. Implements the endpoints used by this app (ping, voucherlist,
+    invoices, vouchers, voucher files, contacts) with synthetic data, simulated latency,
+    a rate limit answered with 429 and random server errors.
+    Request counts per status are available with stats().
+
+    Usage:
+        with MockLexofficeServer(MockOptions(latency=0.05, rate=2)) as server:
+            client.url = server.url
+    """
+
+    def __init__(self, options: MockOptions = None):
+        self.options = options or MockOptions()
+        self.url = None
+        self._process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        context = get_context('spawn')
+        ready = context.Queue()
+        self._process = context.Process(target=_serve, args=(self.options, ready), daemon=True)
+        self._process.start()
+        port = ready.get(timeout=30)
+        self.url = f'http://127.0.0.1:{port}/v1'
+
+    def stop(self):
+        if self._process:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def stats(self) -> dict:
+        """
+        Number of requests served by the mock server per status code.
+        """
+        with urlopen(f'{self.url}/_stats', timeout=5) as response:
+            return json.load(response)
+
+
+class _RateLimit:
+    """
+    Token bucket rejecting requests beyond the rate (instead of delaying them).
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so pooled connections of the client are reused
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, don't let Nagle's algorithm delay the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method):
+        server = self.server
+        url = urlparse(self.path)
+        # Read the body in any case, otherwise the connection can't be reused
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if url.path == '/v1/_stats':
+            with server.stats_lock:
+                stats = dict(server.stats)
+            self._respond(200, stats, count=False)
+            return
+
+        options = server.options
+        if options.latency or options.jitter:
+            time.sleep(options.latency + random.uniform(0, options.jitter))
+
+        if server.rate_limit and not server.rate_limit.allow():
+            headers = {'Retry-After': str(options.retry_after)} if options.retry_after is not None else {}
+            self._respond(429, {'message': 'Rate limit exceeded'}, headers)
+        elif options.error_rate and random.random() < options.error_rate:
+            self._respond(503, {'message': 'Service unavailable'})
+        else:
+            status, content = self._route(method, url, body)
+            self._respond(status, content)
+
+    def _route(self, method, url, body) -> tuple[int, dict]:
+        options = self.server.options
+        path = url.path
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if method == 'GET' and path == '/v1/ping':
+            return 200, {'organizationId': get_id('organization', 0), 'userEmail': 'benchmark@example.com'}
+        if method == 'GET' and path == '/v1/voucherlist':
+            size = min(int(query.get('size', VOUCHERLIST_MAX_PAGE_SIZE)), VOUCHERLIST_MAX_PAGE_SIZE)
+            return 200, make_voucherlist(options.vouchers, int(query.get('page', 0)), size)
+        match = _INVOICE_PATH.match(path)
+        if method == 'GET' and match:
+            invoice_id = match.group(1)
+            return 200, make_invoice(int(invoice_id[:8], 16) % max(options.vouchers, 1), options.invoice_lines, invoice_id)
+        if method == 'POST' and path == '/v1/vouchers':
+            json.loads(body)
+            return 200, {'id': str(uuid.uuid4()), 'version': 1}
+        if method == 'POST' and _VOUCHER_FILES_PATH.match(path):
+            return 202, {'id': str(uuid.uuid4())}
+        if method == 'GET' and path == '/v1/contacts':
+            return 200, {'content': [{'id': get_id('contact', query.get('name', ''))}]}
+        if method == 'POST' and path == '/v1/contacts':
+            return 200, {'id': str(uuid.uuid4()), 'version': 0}
+        return 404, {'message': f'No mock for {method} {path}'}
+
+    def _respond(self, status: int, content: dict, headers: dict = None, count: bool = True):
+        data = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        if not count:
+            return
+        with self.server.stats_lock:
+            self.server.stats[str(status)] = self.server.stats.get(str(status), 0) + 1
+
+
+def _serve(options: MockOptions, ready):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.options = options
+    server.rate_limit = _RateLimit(options.rate) if options.rate else None
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    ready.put(server.server_address[1])
+    server.serve_forever()
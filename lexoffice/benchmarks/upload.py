@@ -0,0 +1,84 @@
+import time
+import traceback
+import uuid
+from unittest.mock import patch
+
+import frappe
+
+from ..contacts import get_stored_contact_id, invalidate
+from ..documents import get_document_type
+from ..events import sales_invoice
+from ..render import get_render_context
+from .client import get_benchmark_client, get_synthetic_pdf
+from .result import BenchmarkResult
+from .server import MockLexofficeServer, MockOptions
+
+
+def run_upload_benchmark(template: str, invoices: int = 100, options: MockOptions = None, client_rate: float = None,
+                         doctype: str = 'Sales Invoice', pdf_size: int = None) -> BenchmarkResult:
+    """
+    Measure uploading synthetic invoices end to end, as upload_job does for each submitted
+    invoice: contact lookup, sync ledger, voucher creation and PDF upload, against the mock server.
+
+    The synthetic invoices are copies of a submitted template invoice, which are never saved.
+    Their PDF is the rendered template (or a synthetic one of pdf_size bytes), so rendering is
+    excluded; it is measured by the render stage of the sync metrics. Sync ledger entries of
+    the run, and the contact mapping if it was created by the run, are deleted afterwards.
+    Meant for a development or test site: the metrics of the site include the run.
+
+    :param template: Name of a submitted Sales or Purchase Invoice
+    :param invoices: Number of synthetic invoices
+    :param pdf_size: Size of a synthetic PDF to be uploaded instead of the rendered template
+    """
+    template = frappe.get_doc(doctype, template)
+    if template.docstatus != 1:
+        frappe.throw(f'{doctype} {template.name} is not submitted')
+
+    document_type = get_document_type(doctype)
+    party = document_type.get_party(template)
+    had_contact = bool(get_stored_contact_id(document_type.party_type, party))
+    settings = frappe.get_single('Lexoffice Settings')
+    pdf = get_synthetic_pdf(pdf_size) if pdf_size else sales_invoice.render_pdf(template, get_render_context())
+    pdf_file = frappe._dict(get_content=lambda: pdf)
+    prefix = f'BENCH-{uuid.uuid4().hex[:8]}'
+
+    latencies = []
+    errors = 0
+    first_error = None
+    with MockLexofficeServer(options) as server:
+        api = get_benchmark_client(server.url, pool_size=1, rate=client_rate)
+        try:
+            with patch.object(sales_invoice, 'get_existing_pdf', lambda doc, render_context: pdf_file):
+                started = time.perf_counter()
+                for index in range(invoices):
+                    doc = frappe.copy_doc(template)
+                    doc.name = f'{prefix}-{index:06d}'
+                    doc.docstatus = 1
+                    doc.modified = template.modified
+
+                    invoice_started = time.perf_counter()
+                    try:
+                        sales_invoice.upload_invoice(doc, api, settings)
+                    except Exception:
+                        errors += 1
+                        first_error = first_error or traceback.format_exc()
+                        continue
+                    latencies.append(time.perf_counter() - invoice_started)
+                seconds = time.perf_counter() - started
+        finally:
+            api.close()
+            _clean_up(prefix, document_type.party_type, party, had_contact)
+        server_stats = server.stats()
+
+    return BenchmarkResult(f'upload_invoice ({doctype})', len(latencies), seconds, latencies, {
+        'retries': api.metrics.retries,
+        'server': server_stats,
+    }, errors=errors, first_error=first_error)
+
+def _clean_up(prefix: str, party_type: str, party: str, had_contact: bool):
+    frappe.db.rollback()
+    frappe.db.delete('Lexoffice Sync Ledger', {'reference_name': ('like', f'{prefix}-%')})
+    if not had_contact:
+        frappe.db.delete('Lexoffice Contact', {'party_type': party_type, 'party': party})
+        invalidate(party_type, party)
+    frappe.db.commit()
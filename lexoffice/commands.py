@@ -0,0 +1,102 @@
+import click
+from frappe.commands import get_site, pass_context
+
+from .documents import DOCUMENT_TYPES
+
+
+@click.command('lexoffice-backfill')
+@click.option('--doctype', default='Sales Invoice', type=click.Choice(list(DOCUMENT_TYPES)), help='Document type to upload')
+@click.option('--from', 'from_date', help='Only documents posted on or after this date (YYYY-MM-DD)')
+@click.option('--to', 'to_date', help='Only documents posted on or before this date (YYYY-MM-DD)')
+@click.option('--chunk-size', default=500, type=int, help='Documents read and uploaded per chunk')
+@click.option('--restart', is_flag=True, default=False, help='Ignore the saved position of an interrupted run')
+@pass_context
+def lexoffice_backfill(context, doctype, from_date=None, to_date=None, chunk_size=500, restart=False):
+    """
+    Upload historical documents that were never synced to lexoffice.
+    Resumes an interrupted run with the same arguments.
+    """
+    import frappe
+    from .backfill import backfill
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        for progress in backfill(doctype, from_date, to_date, chunk_size=chunk_size, restart=restart):
+            click.echo(
+                f'Chunk {progress.chunks} up to {progress.checkpoint[0]} {progress.checkpoint[1]}: '
+                f'{progress.completed} uploaded, {progress.failed} failed'
+            )
+    finally:
+        frappe.destroy()
+
+
+@click.command('lexoffice-benchmark')
+@click.argument('benchmark', type=click.Choice(['client', 'parsing', 'upload']))
+@click.option('--requests', default=200, type=int, help='Operations per client benchmark')
+@click.option('--threads', default=4, type=int, help='Threads calling the client concurrently')
+@click.option('--latency', default=0.05, type=float, help='Seconds the mock server takes per request')
+@click.option('--jitter', default=0.02, type=float, help='Random extra seconds per request (up to)')
+@click.option('--server-rate', type=float, help='Requests per second the mock server accepts before answering 429')
+@click.option('--client-rate', type=float, help='Requests per second of the client\'s rate limiter (default: unthrottled)')
+@click.option('--error-rate', default=0.0, type=float, help='Share of requests the mock server fails with 503')
+@click.option('--vouchers', default=10000, type=int, help='Vouchers in the voucherlist of the mock server')
+@click.option('--records', default='10000,100000', help='Comma-separated numbers of records to parse')
+@click.option('--template', help='Submitted invoice the synthetic invoices are copied from (upload benchmark)')
+@click.option('--doctype', default='Sales Invoice', type=click.Choice(list(DOCUMENT_TYPES)), help='Document type of the template')
+@click.option('--invoices', default=100, type=int, help='Synthetic invoices to upload')
+@click.option('--json', 'as_json', is_flag=True, default=False, help='Print the results as JSON')
+@pass_context
+def lexoffice_benchmark(context, benchmark, requests=200, threads=4, latency=0.05, jitter=0.02, server_rate=None,
+                        client_rate=None, error_rate=0.0, vouchers=10000, records='10000,100000', template=None,
+                        doctype='Sales Invoice', invoices=100, as_json=False):
+    """
+    Benchmark the sync path offline against a local stand-in of the lexoffice API:
+    client throughput and latency (client), decoding of API responses (parsing) or
+    uploads of synthetic invoices copied from a template (upload, needs a site).
+    """
+    import json
+
+    from .benchmarks.server import MockOptions
+
+    options = MockOptions(latency=latency, jitter=jitter, rate=server_rate, error_rate=error_rate, vouchers=vouchers)
+    server_stats = None
+    if benchmark == 'client':
+        from .benchmarks.client import run_client_benchmark
+
+        results, server_stats = run_client_benchmark(options, requests=requests, threads=threads, client_rate=client_rate)
+    elif benchmark == 'parsing':
+        from .benchmarks.parsing import run_parsing_benchmark
+
+        results = run_parsing_benchmark(tuple(int(count) for count in records.split(',')))
+    else:
+        import frappe
+        from .benchmarks.upload import run_upload_benchmark
+
+        if not template:
+            raise click.UsageError('--template is required for the upload benchmark')
+        frappe.init(site=get_site(context))
+        frappe.connect()
+        try:
+            results = [run_upload_benchmark(template, invoices, options, client_rate=client_rate, doctype=doctype)]
+        finally:
+            frappe.destroy()
+
+    if as_json:
+        click.echo(json.dumps({'results': [result.to_dict() for result in results], 'server': server_stats}, indent=1))
+    else:
+        for result in results:
+            click.echo(str(result))
+        if server_stats:
+            click.echo(f'Mock server responses: {server_stats}')
+
+    # Timings of failed operations are meaningless, don't let them pass as a result
+    failed = [result for result in results if result.failed]
+    for result in failed:
+        click.echo(f'\nFirst error of {result.name} ({result.errors} errors):\n{result.first_error}', err=True)
+    if failed:
+        raise click.ClickException(f'{len(failed)} of {len(results)} benchmarks had failed operations')
+
+
+commands = [lexoffice_backfill, lexoffice_benchmark]
@@ -0,0 +1,86 @@
+import frappe
+
+from .api.api import LexofficeClient
+from .api.cache import LRUCache
+
+VERSION_KEY = 'lexoffice:contact_version'
+
+# (version, lexoffice contact ID) by (site, party type, party) in front of the Lexoffice Contact doctype
+_contact_ids = LRUCache(maxsize=4096)
+
+PARTY_ROLES = {
+    'Customer': ('customer', 'customer_name'),
+    'Supplier': ('vendor', 'supplier_name'),
+}
+
+
+def get_contact_id(api: LexofficeClient, party_type: str, party: str) -> str:
+    """
+    Get the lexoffice contact ID of a customer or supplier.
+
+    Looks in the process-wide LRU first (valid until any mapping changes on the site, see
+    invalidate()), then in the stored mapping (Lexoffice Contact) and only asks the lexoffice
+    API (search, then create) if the party was never synced before.
+    Concurrent jobs for the same new party are serialized, so only one contact is created.
+    """
+    key = (frappe.local.site, party_type, party)
+    version = frappe.cache().get_value(VERSION_KEY)
+    cached = _contact_ids.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    contact_id = get_stored_contact_id(party_type, party)
+    if not contact_id:
+        lock_name = frappe.cache().make_key(f'lexoffice:contact:{party_type}:{party}')
+        with frappe.cache().lock(lock_name, timeout=120, blocking_timeout=120):
+            # End the current transaction, so a mapping committed by the job we waited for is visible
+            frappe.db.commit()
+            contact_id = get_stored_contact_id(party_type, party)
+            if not contact_id:
+                contact_id = create_contact(api, party_type, party)
+
+    _contact_ids.set(key, (version, contact_id))
+    return contact_id
+
+def get_stored_contact_id(party_type: str, party: str) -> str | None:
+    return frappe.db.get_value('Lexoffice Contact', {'party_type': party_type, 'party': party}, 'contact_id')
+
+def create_contact(api: LexofficeClient, party_type: str, party: str) -> str:
+    """
+    Get or create the contact in lexoffice and store the mapping.
+    """
+    role, name_field = PARTY_ROLES[party_type]
+    contact_id = api.create_or_get_contact(
+        roles={role: {}},
+        company={'name': frappe.db.get_value(party_type, party, name_field)},
+        person=None)
+
+    frappe.get_doc({
+        'doctype': 'Lexoffice Contact',
+        'party_type': party_type,
+        'party': party,
+        'contact_id': contact_id
+    }).insert(ignore_permissions=True)
+    frappe.db.commit()
+    return contact_id
+
+def invalidate(party_type: str, party: str):
+    """
+    Drop the cached contact ID of a party in this process and make all workers of the site
+    revalidate theirs against the stored mapping.
+    """
+    _contact_ids.pop((frappe.local.site, party_type, party))
+    frappe.cache().set_value(VERSION_KEY, frappe.generate_hash(length=10))
+
+def on_party_rename(doc, method, old, new, merge=False):
+    """
+    Drop cached contact IDs of a renamed customer or supplier.
+    The stored mapping follows the rename through its Dynamic Link.
+    """
+    invalidate(doc.doctype, old)
+    invalidate(doc.doctype, new)
+
+def on_party_trash(doc, method):
+    for name in frappe.get_all('Lexoffice Contact', filters={'party_type': doc.doctype, 'party': doc.name}, pluck='name'):
+        frappe.delete_doc('Lexoffice Contact', name, ignore_permissions=True)
+    invalidate(doc.doctype, doc.name)
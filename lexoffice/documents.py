@@ -0,0 +1,47 @@
+from .api.datatypes import VoucherType
+
+
+class DocumentType:
+    """
+    How a submitted ERPNext document is uploaded to lexoffice.
+    """
+    doctype: str
+    party_type: str
+    party_field: str
+    auto_upload_field: str
+    voucher_type: VoucherType
+    credit_note_type: VoucherType
+    attached_pdf: bool
+
+    def __init__(self, doctype, party_type, party_field, auto_upload_field, voucher_type, credit_note_type, attached_pdf=False):
+        self.doctype = doctype
+        self.party_type = party_type
+        self.party_field = party_field
+        self.auto_upload_field = auto_upload_field
+        self.voucher_type = voucher_type
+        self.credit_note_type = credit_note_type
+        # Upload the PDF attached to the document (e.g. the supplier's invoice) instead of printing it
+        self.attached_pdf = attached_pdf
+
+    def get_voucher_type(self, doc) -> VoucherType:
+        """Returns are uploaded as credit notes."""
+        return self.credit_note_type if doc.get('is_return') else self.voucher_type
+
+    def get_party(self, doc) -> str:
+        return doc.get(self.party_field)
+
+
+DOCUMENT_TYPES = {
+    'Sales Invoice': DocumentType(
+        'Sales Invoice', 'Customer', 'customer', 'au_sales_invoice',
+        VoucherType.SALES_INVOICE, VoucherType.SALES_CREDIT_NOTE
+    ),
+    'Purchase Invoice': DocumentType(
+        'Purchase Invoice', 'Supplier', 'supplier', 'au_purchase_invoice',
+        VoucherType.PURCHASE_INVOICE, VoucherType.PURCHASE_CREDIT_NOTE, attached_pdf=True
+    ),
+}
+
+
+def get_document_type(doctype: str) -> DocumentType:
+    return DOCUMENT_TYPES[doctype]
@@ -1,102 +1,352 @@
 import frappe
+from frappe.utils import flt, getdate
 #from frappe.utils.file_manager import save_file
-from ..api.api import LexofficeClient
 from frappe.utils.weasyprint import PrintFormatGenerator
 from frappe.core.api.file import create_new_folder
 from frappe.model.naming import _format_autoname
 from frappe.realtime import publish_realtime
+from ..api.datatypes import VoucherType
+from ..api.exceptions import is_transient
+from ..contacts import get_contact_id, get_stored_contact_id
+from ..documents import get_document_type
+from ..mapping import get_voucher_items
+from ..metrics import get_metrics, maybe_profile
+from ..queues import QUEUE, get_in_flight_limiter, get_queue, get_upload_timeout
+from ..reconcile import find_voucher_id
+from ..render import get_render_context
+from ..retry import defer_failure
+from ..lexoffice.doctype.lexoffice_sync_ledger import lexoffice_sync_ledger as sync_ledger
+from ..lexoffice.doctype.lexoffice_upload_queue.lexoffice_upload_queue import enqueue as enqueue_batch_upload
+import hashlib
 import os
-from frappe import utils
+import time
+
+# Seconds an upload job waits for a free in-flight slot before it is queued again
+IN_FLIGHT_WAIT = 5
 
 def upload(doc, method):
     """
-    Uploads the sales invoice to Lexoffice.
-    Is called on submit of a sales invoice.
+    Uploads the invoice (or credit note) to Lexoffice.
+    Is called on submit of a sales or purchase invoice.
+    In batch mode the invoice is only queued and uploaded by the next batch run.
+    """
+    document_type = get_document_type(doc.doctype)
+    if not frappe.db.get_single_value('Lexoffice Settings', document_type.auto_upload_field):
+        return
+
+    if frappe.db.get_single_value('Lexoffice Settings', 'batch_mode'):
+        enqueue_batch_upload(doc.doctype, doc.name)
+        return
+
+    enqueue_upload_job(doc, get_content_hash(doc))
+
+def enqueue_upload_job(doc, content_hash: str, requeued: int = 0):
+    """
+    Enqueue the upload job of a document on the lexoffice queue.
+    Only the document's name is passed, the worker loads the committed document itself.
+    The job ID deduplicates double submits of the same document version.
+
+    :param requeued: Times the job was queued again for lack of a free in-flight slot
     """
-    args = { 'doc': doc }
+    document_type = get_document_type(doc.doctype)
+    pdf_file = get_attached_pdf(doc) if document_type.attached_pdf else None
     frappe.enqueue(
         method=upload_job,
-        timeout=120,
-        **args
+        queue=get_queue(QUEUE),
+        timeout=get_upload_timeout(doc, (pdf_file.file_size or 0) if pdf_file else 0),
+        job_id=f'lexoffice::upload::{doc.doctype}::{doc.name}::{content_hash}' + (f'::{requeued}' if requeued else ''),
+        deduplicate=True,
+        enqueue_after_commit=True,
+        doctype=doc.doctype,
+        name=doc.name,
+        content_hash=content_hash,
+        queued_at=time.time(),
+        requeued=requeued
     )
 
-def upload_job(doc):
+def get_content_hash(doc) -> str:
+    """
+    Short hash identifying the version of a document (changes with every save).
+    """
+    return hashlib.sha1(f'{doc.doctype}|{doc.name}|{doc.modified}'.encode()).hexdigest()[:12]
+
+def upload_job(doctype=None, name=None, content_hash=None, doc=None, queued_at=None, requeued=0):
+    """
+    Background job uploading one document.
+
+    :param content_hash: Version of the document when it was submitted (see get_content_hash)
+    :param doc: Document (jobs enqueued by older versions of this app)
+    :param queued_at: Time the job was enqueued (for the queue wait metric)
+    :param requeued: Times the job was queued again for lack of a free in-flight slot
+    """
+    if doc is not None:
+        doctype, name = doc.doctype, doc.name
+
+    metrics = get_metrics()
+    if queued_at:
+        metrics.observe('lexoffice_queue_wait_seconds', {'queue': 'job'}, max(time.time() - queued_at, 0))
+    try:
+        with maybe_profile('upload_job'):
+            _upload_job(doctype, name, content_hash, requeued)
+    finally:
+        metrics.flush()
+
+def _upload_job(doctype, name, content_hash, requeued=0):
     # Get settings
     settings = frappe.get_single('Lexoffice Settings')
 
     # Check if auto upload is enabled
-    if not settings.au_sales_invoice:
+    if not settings.get(get_document_type(doctype).auto_upload_field):
         return
-    
-    # Setup api
-    api = LexofficeClient(settings.get_password('api_key'))
-
-    # ERPNext-Customer
-    customer = frappe.get_doc('Customer', doc.customer)
-    customer_name = customer.customer_name
-
-    # Get or create customer
-    contact_id = api.create_or_get_contact(
-        roles={'customer':{}},
-        company={'name': customer_name},
-        person=None)
-    
-    # Generate PDF
-    pdf_file = generate_pdf(doc)
-    file_path = get_absolute_path(pdf_file.file_url) if pdf_file else None
-    print(file_path)
-
-    # Create voucher
-    voucher_id = api.create_voucher(
-        type='salesinvoice',
-        voucher_number=doc.name,
-        voucher_date=doc.posting_date,
-        total_gross_amount=doc.grand_total,
-        total_tax_amount=doc.total_taxes_and_charges,
-        tax_type='net' if doc.total <= doc.grand_total else 'gross',
+
+    # Load the current version, it may have been cancelled since it was queued
+    doc = frappe.get_doc(doctype, name)
+    if doc.docstatus != 1:
+        return
+    if content_hash and content_hash != get_content_hash(doc):
+        frappe.logger('lexoffice').info(f'{doctype} {name} changed since it was queued, uploading the current version')
+
+    # Wait for a free slot if the configured number of uploads is in flight already
+    in_flight = get_in_flight_limiter(settings.max_in_flight, ttl=get_upload_timeout(doc))
+    with get_metrics().stage('in_flight_wait', doctype=doc.doctype):
+        token = in_flight.acquire(timeout=IN_FLIGHT_WAIT)
+    if token is None:
+        # Go to the back of the lexoffice queue instead of holding this worker. Not a failed
+        # attempt, the upload keeps its priority over batch runs.
+        enqueue_upload_job(doc, content_hash or get_content_hash(doc), requeued + 1)
+        frappe.db.commit()
+        return
+
+    # Setup api (pooled client, shared with other jobs of this worker)
+    api = settings.get_client()
+
+    try:
+        voucher_id = upload_invoice(doc, api, settings)
+    except Exception as e:
+        # Retry temporary failures through the upload queue, park the others for replay
+        get_metrics().inc('lexoffice_documents_total', {'doctype': doc.doctype, 'result': 'failed'})
+        frappe.db.rollback()
+        defer_failure(doc.doctype, doc.name, frappe.get_traceback(), is_transient(e), payload=get_payload(doc))
+        frappe.db.commit()
+        return
+    finally:
+        in_flight.release(token)
+    frappe.logger('lexoffice').info(f'Uploaded {doc.doctype} {doc.name} as voucher {voucher_id}')
+
+def upload_invoice(doc, api, settings) -> str | None:
+    """
+    Create the voucher for an invoice in Lexoffice and attach its PDF.
+    Skips invoices the sync ledger records as synced (or being synced by another job).
+
+    :param doc: Sales or Purchase Invoice
+    :param api: LexofficeClient to be used
+    :param settings: Lexoffice Settings
+    :return: ID of the voucher (None if another job is syncing the invoice)
+    """
+    voucher_id = sync_ledger.get_completed_voucher_id(doc.doctype, doc.name)
+    if voucher_id:
+        return voucher_id
+
+    # Get or create customer / supplier
+    metrics = get_metrics()
+    document_type = get_document_type(doc.doctype)
+    with metrics.stage('contact', doctype=doc.doctype):
+        contact_id = get_contact_id(api, document_type.party_type, document_type.get_party(doc))
+    voucher_data = get_voucher_data(doc, contact_id)
+
+    entry = sync_ledger.begin(doc.doctype, doc.name)
+    if entry is None:
+        return sync_ledger.get_completed_voucher_id(doc.doctype, doc.name)
+
+    try:
+        # Get PDF (rendered in memory unless attached or cached)
+        started = time.monotonic()
+        render_context = get_render_context()
+        pdf_file = get_existing_pdf(doc, render_context)
+        file_name = get_pdf_file_name(doc, render_context)
+        pdf_data = get_pdf_content(pdf_file) if pdf_file else render_pdf(doc, render_context)
+        render_time = time.monotonic() - started
+        if not pdf_file:
+            metrics.observe_stage('render', render_time, doctype=doc.doctype)
+
+        # Create voucher (unless a previous attempt did) and upload the PDF straight from memory
+        started = time.monotonic()
+        voucher_id = recover_voucher(api, entry, voucher_data)
+        if not voucher_id:
+            with metrics.stage('create_voucher', doctype=doc.doctype):
+                voucher_id = api.create_voucher(**voucher_data)
+            sync_ledger.set_voucher(entry.name, voucher_id)
+        with metrics.stage('upload_file', doctype=doc.doctype):
+            upload = api.upload_voucher_file(voucher_id, pdf_data, filename=f'{doc.name.replace("/", "-")}.pdf')
+        upload_time = time.monotonic() - started
+    except Exception:
+        frappe.db.rollback()
+        sync_ledger.fail(entry.name, frappe.get_traceback())
+        raise
+
+    sync_ledger.complete(entry.name, upload.file_id, render_time=render_time, upload_time=upload_time)
+    metrics.inc('lexoffice_documents_total', {'doctype': doc.doctype, 'result': 'completed'})
+
+    # Attach the newly rendered PDF to the invoice (in this job, the PDF is in memory already).
+    # The upload is complete at this point, failing to archive the PDF is only logged.
+    if not pdf_file and settings.archive_pdf:
+        try:
+            archive_pdf(pdf_data, doc.doctype, doc.name, file_name)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=f'Lexoffice: Archiving the PDF of {doc.doctype} {doc.name} failed')
+
+    return voucher_id
+
+def get_voucher_data(doc, contact_id) -> dict:
+    """
+    Build the arguments of LexofficeClient.create_voucher for a sales or purchase invoice.
+    Purchase invoices are booked with the supplier's invoice number and date.
+    Returns become credit notes with positive amounts.
+    """
+    sign = -1 if doc.get('is_return') else 1
+    voucher_items = get_voucher_items(doc)
+    return dict(
+        type=get_document_type(doc.doctype).get_voucher_type(doc).value,
+        voucher_number=doc.get('bill_no') or doc.name,
+        # Documents loaded from the database carry dates, the payload must be JSON serializable
+        voucher_date=str(getdate(doc.get('bill_date') or doc.posting_date)),
+        total_gross_amount=sign * flt(doc.grand_total),
+        # Fixed charges (e.g. freight) are voucher items without tax, not part of the tax amount
+        total_tax_amount=flt(sum(item['taxAmount'] for item in voucher_items), 2),
+        # Voucher items carry net amounts (see get_voucher_items)
+        tax_type='net',
         use_collective_contact=False,
         contact_id=contact_id,
-        voucher_items=[{
-                'amount': doc.total,
-                'taxAmount': doc.total_taxes_and_charges,
-                'taxRatePercent': round(doc.total_taxes_and_charges / doc.total * 100, 1),
-                'categoryId': '8f8664a1-fd86-11e1-a21f-0800200c9a66'    # Incomings
-            }
-        ],
-        file_path=file_path)
-
-    print(f'[Lexoffice] Created voucher: {voucher_id}')
-
-def generate_pdf(doc):
-    settings = frappe.get_single('Lexoffice Settings')
-    lang = settings.lang
+        voucher_items=voucher_items)
 
-    if lang:
-        frappe.local.lang = lang
-        frappe.local.lang_full_dict = None
-        frappe.local.jenv = None
+def recover_voucher(api, entry, voucher_data: dict) -> str | None:
+    """
+    Voucher of a ledger entry, including one a previous attempt created without recording it
+    (e.g. POST /vouchers timed out after lexoffice created the voucher). It is looked up by
+    voucher number and contact, so the retry doesn't create a second voucher.
 
-    target_folder = create_folder('Sales Invoice', "Home")
+    :param entry: Ledger entry returned by sync_ledger.begin (its voucher_id is updated)
+    """
+    if entry.voucher_id or not entry.retried:
+        return entry.voucher_id
+    voucher_id = find_voucher_id(api, VoucherType(voucher_data['type']), voucher_data['voucher_number'], voucher_data['contact_id'])
+    if voucher_id:
+        sync_ledger.set_voucher(entry.name, voucher_id)
+        entry.voucher_id = voucher_id
+    return voucher_id
 
-    if frappe.db.get_value('Print Format', settings.print_format, 'print_format_builder_beta'):
-        pdf_data = PrintFormatGenerator(settings.print_format, doc, settings.letterhead).render_pdf()
-    else:
-        pdf_data = frappe.get_print('Sales Invoice', doc.name, settings.print_format, as_pdf=True, letterhead=settings.letterhead)
+def get_payload(doc) -> dict | None:
+    """
+    Voucher data of a document for the record of a failed upload (without calling the API).
+    """
+    try:
+        document_type = get_document_type(doc.doctype)
+        return get_voucher_data(doc, get_stored_contact_id(document_type.party_type, document_type.get_party(doc)))
+    except Exception:
+        return None
+
+def get_pdf_file_name(doc, render_context) -> str:
+    """
+    Name of the PDF file of a document, including a hash of everything the rendering depends on.
+    """
+    key = '|'.join(str(value) for value in (
+        doc.doctype,
+        doc.name,
+        doc.modified,
+        render_context.print_format,
+        render_context.print_format_modified,
+        render_context.letterhead,
+        render_context.letterhead_modified,
+        render_context.lang or frappe.local.lang
+    ))
+    digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+    return f'{doc.name.replace("/", "-")}-{digest}.pdf'
 
-    return save_and_attach(pdf_data, 'Sales Invoice', doc.name, target_folder)
+def get_existing_pdf(doc, render_context):
+    """
+    Get the File of the PDF to be uploaded if there is one already: the PDF attached to
+    the document (e.g. the supplier's invoice) for purchase documents, otherwise a PDF
+    rendered before with the same inputs (or None).
+    """
+    if get_document_type(doc.doctype).attached_pdf:
+        pdf_file = get_attached_pdf(doc)
+        if pdf_file:
+            return pdf_file
+    return get_cached_pdf(doc, render_context)
 
-def save_and_attach(content, to_doctype, to_name, folder, auto_name=None):
+def get_pdf_content(pdf_file) -> bytes:
+    """
+    Content of a PDF File as bytes. File.get_content() returns str for files that decode
+    as UTF-8 (e.g. plain ASCII PDFs), which the uploader would take for a path.
+    """
+    content = pdf_file.get_content()
+    return content.encode() if isinstance(content, str) else content
+
+def get_attached_pdf(doc):
+    """
+    Get the File of the first PDF attached to a document by a user (not rendered by this app).
+    """
+    name = frappe.db.get_value('File', {
+        'attached_to_doctype': doc.doctype,
+        'attached_to_name': doc.name,
+        'file_name': ('like', '%.pdf'),
+        'is_folder': 0,
+        'folder': ('!=', f'Home/{doc.doctype}')
+    }, order_by='creation asc')
+    return frappe.get_doc('File', name) if name else None
+
+def get_cached_pdf(doc, render_context):
+    """
+    Get the File of a PDF already rendered with the same inputs (or None).
+    """
+    name = frappe.db.get_value('File', {
+        'attached_to_doctype': doc.doctype,
+        'attached_to_name': doc.name,
+        'file_name': get_pdf_file_name(doc, render_context)
+    })
+    return frappe.get_doc('File', name) if name else None
+
+def archive_pdf(pdf_data, doctype, name, file_name):
+    """
+    Store a rendered PDF as private File attached to its document (once per file name).
+    """
+    existing = frappe.db.get_value('File', {
+        'attached_to_doctype': doctype,
+        'attached_to_name': name,
+        'file_name': file_name
+    })
+    if existing:
+        return frappe.get_doc('File', existing)
+    target_folder = create_folder(doctype, "Home")
+    return save_and_attach(pdf_data, doctype, name, target_folder, file_name=file_name)
+
+def render_pdf(doc, render_context) -> bytes:
+    """
+    Render the PDF of an invoice with the print settings of the render context.
+    The configured print format is for sales invoices, other documents use their default one.
+    """
+    render_context.activate()
+
+    if doc.doctype != 'Sales Invoice':
+        return frappe.get_print(doc.doctype, doc.name, as_pdf=True, letterhead=render_context.letterhead)
+    if render_context.print_format_builder_beta:
+        return PrintFormatGenerator(render_context.print_format, doc, render_context.letterhead).render_pdf()
+    return frappe.get_print(doc.doctype, doc.name, render_context.print_format, as_pdf=True, letterhead=render_context.letterhead)
+
+def save_and_attach(content, to_doctype, to_name, folder, auto_name=None, file_name=None):
     """
     Save content to disk and create a File document.
 
     File document is linked to another document.
     """
-    if auto_name:
+    if not file_name and auto_name:
         doc = frappe.get_doc(to_doctype, to_name)
         # based on type of format used set_name_form_naming_option return result.
         pdf_name = set_name_from_naming_options(auto_name, doc)
         file_name = "{pdf_name}.pdf".format(pdf_name=pdf_name.replace("/", "-"))
-    else:
+    elif not file_name:
         file_name = "{to_name}.pdf".format(to_name=to_name.replace("/", "-"))
 
     file = frappe.new_doc("File")
@@ -129,10 +379,3 @@ def create_folder(folder, parent):
 		create_new_folder(folder, parent)
 
 	return new_folder_name
-
-def get_absolute_path(file_name):
-	if(file_name.startswith('/files/')):
-		file_path = f'{utils.get_bench_path()}/sites/{utils.get_site_base_path()[2:]}/public{file_name}'
-	if(file_name.startswith('/private/')):
-		file_path = f'{utils.get_bench_path()}/sites/{utils.get_site_base_path()[2:]}{file_name}'
-	return file_path
\ No newline at end of file
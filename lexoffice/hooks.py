@@ -9,9 +9,45 @@ required_apps = ["erpnext"]
 doc_events = {
     "Sales Invoice": {
         "on_submit": "lexoffice.events.sales_invoice.upload"
+    },
+    "Purchase Invoice": {
+        "on_submit": "lexoffice.events.sales_invoice.upload"
+    },
+    "Customer": {
+        "after_rename": "lexoffice.contacts.on_party_rename",
+        "on_trash": "lexoffice.contacts.on_party_trash"
+    },
+    "Supplier": {
+        "after_rename": "lexoffice.contacts.on_party_rename",
+        "on_trash": "lexoffice.contacts.on_party_trash"
+    },
+    "Lexoffice Settings": {
+        "on_update": "lexoffice.render.invalidate"
+    },
+    "Print Format": {
+        "on_update": "lexoffice.render.invalidate"
+    },
+    "Letter Head": {
+        "on_update": "lexoffice.render.invalidate"
     }
 }
 
+ignore_links_on_delete = ["Lexoffice Contact", "Lexoffice Upload Queue", "Lexoffice Sync Ledger", "Lexoffice Reconciliation Issue", "Lexoffice Failed Upload"]
+
+scheduler_events = {
+    "cron": {
+        "* * * * *": [
+            "lexoffice.tasks.process_upload_queue"
+        ],
+        "*/15 * * * *": [
+            "lexoffice.payment_status.process_payment_status"
+        ]
+    },
+    "hourly": [
+        "lexoffice.reconcile.process_reconciliation"
+    ]
+}
+
 # Includes in <head>
 # ------------------
 
@@ -74,7 +110,8 @@ doc_events = {
 # ------------
 
 # before_install = "lexoffice.install.before_install"
-# after_install = "lexoffice.install.after_install"
+after_install = "lexoffice.install.after_install"
+after_migrate = "lexoffice.install.after_migrate"
 
 # Uninstallation
 # ------------
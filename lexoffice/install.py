@@ -0,0 +1,50 @@
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+# lexoffice voucher status and the labels shown on the Sales Invoice
+VOUCHER_STATUS_LABELS = {
+    'draft': 'Draft',
+    'open': 'Open',
+    'overdue': 'Overdue',
+    'paid': 'Paid',
+    'paidoff': 'Paid Off',
+    'sepadebit': 'SEPA Debit',
+    'transferred': 'Transferred',
+    'voided': 'Voided',
+}
+
+
+def get_custom_fields():
+    return {
+        'Sales Invoice': [
+            {
+                'fieldname': 'lexoffice_status',
+                'fieldtype': 'Select',
+                'label': 'Lexoffice Status',
+                'options': '\n' + '\n'.join(VOUCHER_STATUS_LABELS.values()),
+                'insert_after': 'outstanding_amount',
+                'read_only': 1,
+                'allow_on_submit': 1,
+                'no_copy': 1,
+                'print_hide': 1,
+                'in_standard_filter': 1,
+            },
+            {
+                'fieldname': 'lexoffice_open_amount',
+                'fieldtype': 'Currency',
+                'label': 'Lexoffice Open Amount',
+                'options': 'currency',
+                'insert_after': 'lexoffice_status',
+                'read_only': 1,
+                'allow_on_submit': 1,
+                'no_copy': 1,
+                'print_hide': 1,
+            },
+        ]
+    }
+
+def after_install():
+    create_custom_fields(get_custom_fields(), ignore_validate=True)
+
+def after_migrate():
+    # Adds fields introduced by updates of this app
+    create_custom_fields(get_custom_fields(), ignore_validate=True)
@@ -0,0 +1,18 @@
+# Copyright (c) 2026, PC-Giga and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+from lexoffice.contacts import invalidate
+
+
+class LexofficeContact(Document):
+
+	def on_update(self):
+		# A new mapping can't be cached by any worker yet
+		if not self.flags.in_insert:
+			invalidate(self.party_type, self.party)
+
+	def on_trash(self):
+		invalidate(self.party_type, self.party)
@@ -0,0 +1,17 @@
+// Copyright (c) 2026, PC-Giga and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Lexoffice Failed Upload", {
+	refresh(frm) {
+		if (frm.doc.status !== "Resolved") {
+			frm.add_custom_button(__("Replay"), () => {
+				frappe
+					.call({
+						method: "lexoffice.lexoffice.doctype.lexoffice_failed_upload.lexoffice_failed_upload.replay",
+						args: { names: [frm.doc.name] },
+					})
+					.then(() => frm.reload_doc());
+			});
+		}
+	},
+});
@@ -0,0 +1,78 @@
+# Copyright (c) 2026, PC-Giga and contributors
+# For license information, please see license.txt
+
+import json
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+
+from lexoffice.lexoffice.doctype.lexoffice_upload_queue.lexoffice_upload_queue import enqueue
+
+
+class LexofficeFailedUpload(Document):
+
+	def autoname(self):
+		# One entry per document, a new failure updates it
+		self.name = get_failed_upload_name(self.reference_doctype, self.reference_name)
+
+
+def get_failed_upload_name(doctype: str, name: str) -> str:
+	return f'{doctype}::{name}'
+
+def park(doctype: str, name: str, error: str, attempts: int, reason: str = 'Permanent Error', payload: dict = None):
+	"""Record an upload that won't succeed without intervention."""
+	values = {
+		'status': 'Open',
+		'reason': reason,
+		'attempts': attempts,
+		'failed_on': now_datetime(),
+		'error': error,
+		'payload': json.dumps(payload, indent=1, default=str) if payload else None,
+	}
+	failed_upload = get_failed_upload_name(doctype, name)
+	if frappe.db.exists('Lexoffice Failed Upload', failed_upload):
+		frappe.db.set_value('Lexoffice Failed Upload', failed_upload, values)
+	else:
+		frappe.get_doc({
+			'doctype': 'Lexoffice Failed Upload',
+			'reference_doctype': doctype,
+			'reference_name': name,
+			**values
+		}).insert(ignore_permissions=True)
+
+def resolve(doctype: str, name: str):
+	"""Mark a replayed upload as resolved once it succeeded."""
+	frappe.db.set_value(
+		'Lexoffice Failed Upload',
+		{'name': get_failed_upload_name(doctype, name), 'status': ('!=', 'Resolved')},
+		'status',
+		'Resolved'
+	)
+
+@frappe.whitelist()
+def replay(names) -> int:
+	"""Queue failed uploads for the next batch upload run.
+
+	:param names: Names of Lexoffice Failed Upload (list or JSON)
+	:return: Number of queued uploads
+	"""
+	frappe.has_permission('Lexoffice Failed Upload', 'write', throw=True)
+	if isinstance(names, str):
+		names = json.loads(names)
+
+	failed_uploads = frappe.get_all(
+		'Lexoffice Failed Upload',
+		filters={'name': ('in', names), 'status': ('!=', 'Resolved')},
+		fields=['name', 'reference_doctype', 'reference_name']
+	)
+	for failed_upload in failed_uploads:
+		enqueue(failed_upload.reference_doctype, failed_upload.reference_name)
+
+	if failed_uploads:
+		frappe.db.set_value(
+			'Lexoffice Failed Upload',
+			{'name': ('in', [f.name for f in failed_uploads])},
+			{'status': 'Replayed', 'replayed_on': now_datetime()}
+		)
+	return len(failed_uploads)
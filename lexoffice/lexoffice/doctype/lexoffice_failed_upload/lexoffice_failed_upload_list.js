@@ -0,0 +1,20 @@
+// Copyright (c) 2026, PC-Giga and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Lexoffice Failed Upload"] = {
+	onload(listview) {
+		listview.page.add_action_item(__("Replay"), () => {
+			const names = listview.get_checked_items(true);
+			frappe
+				.call({
+					method: "lexoffice.lexoffice.doctype.lexoffice_failed_upload.lexoffice_failed_upload.replay",
+					args: { names },
+					freeze: true,
+				})
+				.then((r) => {
+					frappe.show_alert({ message: __("{0} uploads queued", [r.message]), indicator: "green" });
+					listview.refresh();
+				});
+		});
+	},
+};
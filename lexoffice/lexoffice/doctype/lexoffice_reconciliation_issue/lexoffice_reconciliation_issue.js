@@ -0,0 +1,8 @@
+// Copyright (c) 2026, PC-Giga and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Lexoffice Reconciliation Issue", {
+// 	refresh(frm) {
+
+// 	},
+// });
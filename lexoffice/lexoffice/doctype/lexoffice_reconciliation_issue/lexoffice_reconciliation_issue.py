@@ -0,0 +1,53 @@
+# Copyright (c) 2026, PC-Giga and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+
+
+class LexofficeReconciliationIssue(Document):
+
+	def autoname(self):
+		# One issue per type and voucher (or invoice), so re-runs update instead of duplicating
+		self.name = get_issue_name(self.issue_type, self.voucher_id or self.reference_name)
+
+	def validate(self):
+		if self.status == 'Resolved' and not self.resolved_on:
+			self.resolved_on = now_datetime()
+		elif self.status == 'Open':
+			self.resolved_on = None
+
+
+def get_issue_name(issue_type: str, key: str) -> str:
+	return f'{issue_type}::{key}'
+
+def record(issue_type: str, voucher_number: str, voucher_id: str = None, reference_name: str = None, **values):
+	"""Open an issue or update the existing one of the same type and voucher."""
+	values = {
+		'voucher_number': voucher_number,
+		'voucher_id': voucher_id,
+		'reference_doctype': 'Sales Invoice' if reference_name else None,
+		'reference_name': reference_name,
+		'status': 'Open',
+		'resolved_on': None,
+		**values
+	}
+	name = get_issue_name(issue_type, voucher_id or reference_name)
+	if frappe.db.exists('Lexoffice Reconciliation Issue', name):
+		frappe.db.set_value('Lexoffice Reconciliation Issue', name, values)
+	else:
+		frappe.get_doc({
+			'doctype': 'Lexoffice Reconciliation Issue',
+			'issue_type': issue_type,
+			'detected_on': now_datetime(),
+			**values
+		}).insert(ignore_permissions=True)
+
+def resolve(filters: dict):
+	"""Resolve all open issues matching the filters (e.g. a voucher that matches again)."""
+	frappe.db.set_value(
+		'Lexoffice Reconciliation Issue',
+		{'status': 'Open', **filters},
+		{'status': 'Resolved', 'resolved_on': now_datetime()}
+	)
@@ -1,9 +1,47 @@
 # Copyright (c) 2024, PC-Giga and contributors
 # For license information, please see license.txt
 
-# import frappe
+import hashlib
+
+import frappe
 from frappe.model.document import Document
 
+from lexoffice.api.api import DEFAULT_MAX_RETRIES, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, LexofficeClient, get_client
+from lexoffice.api.cache import RedisCache
+from lexoffice.api.ratelimit import DEFAULT_RATE, RedisTokenBucket
+from lexoffice.metrics import get_metrics
+
 
 class LexofficeSettings(Document):
-	pass
+
+	def get_client(self) -> LexofficeClient:
+		"""Return the pooled client of this worker process for the configured API key.
+
+		Requests of the client are throttled by a token bucket in Redis, which is shared
+		by all workers of this site using the same API key.
+		"""
+		api_key = self.get_password('api_key')
+		client = get_client(
+			api_key,
+			pool_size=self.http_pool_size or DEFAULT_POOL_SIZE,
+			timeout=(
+				self.http_connect_timeout or DEFAULT_TIMEOUT[0],
+				self.http_read_timeout or DEFAULT_TIMEOUT[1],
+			),
+			max_retries=DEFAULT_MAX_RETRIES if self.max_retries is None else self.max_retries,
+		)
+
+		key = frappe.cache().make_key(f'lexoffice:ratelimit:{hashlib.sha256(api_key.encode()).hexdigest()[:16]}')
+		rate = self.rate_limit or DEFAULT_RATE
+		limiter = client.rate_limiter
+		if not isinstance(limiter, RedisTokenBucket) or limiter.key != key or limiter.rate != rate:
+			client.rate_limiter = RedisTokenBucket(frappe.cache(), key, rate=rate)
+
+		# Share fetched invoices with all workers of this site
+		invoice_cache = RedisCache(frappe.cache(), frappe.cache().make_key('lexoffice:invoice:'))
+		if not isinstance(client.invoice_cache, RedisCache) or client.invoice_cache.prefix != invoice_cache.prefix:
+			client.invoice_cache = invoice_cache
+
+		# Record requests in the metrics of this site (see lexoffice.metrics)
+		client.metrics = get_metrics()
+		return client
@@ -0,0 +1,89 @@
+# Copyright (c) 2026, PC-Giga and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_to_date, now_datetime
+
+# Pending entries older than this are considered abandoned by a crashed job
+STALE_AFTER_MINUTES = 30
+
+
+class LexofficeSyncLedger(Document):
+
+	def autoname(self):
+		# One entry per document, enforced by the primary key
+		self.name = get_ledger_name(self.reference_doctype, self.reference_name)
+
+
+def get_ledger_name(doctype: str, name: str) -> str:
+	return f'{doctype}::{name}'
+
+def get_completed_voucher_id(doctype: str, name: str) -> str | None:
+	"""Return the voucher ID if the document was synced completely before."""
+	entry = frappe.db.get_value(
+		'Lexoffice Sync Ledger', get_ledger_name(doctype, name), ['status', 'voucher_id'], as_dict=True
+	)
+	return entry.voucher_id if entry and entry.status == 'Completed' else None
+
+def begin(doctype: str, name: str):
+	"""
+	Claim a document for syncing.
+
+	:return: Ledger entry (name, voucher_id, retried) to continue with, or None if the document
+	    was synced completely or is being synced by another job right now. retried is set if an
+	    earlier attempt may have created the voucher without recording it (see recover_voucher).
+	"""
+	ledger_name = get_ledger_name(doctype, name)
+	values = {
+		'status': 'Pending',
+		'started_on': now_datetime(),
+		'error': None,
+	}
+
+	entry = frappe.db.get_value('Lexoffice Sync Ledger', ledger_name, ['status', 'voucher_id', 'modified'], as_dict=True)
+	if entry is None:
+		try:
+			frappe.get_doc({
+				'doctype': 'Lexoffice Sync Ledger',
+				'reference_doctype': doctype,
+				'reference_name': name,
+				**values
+			}).insert(ignore_permissions=True)
+		except frappe.DuplicateEntryError:
+			frappe.db.rollback()
+			return None
+		frappe.db.commit()
+		return frappe._dict(name=ledger_name, voucher_id=None, retried=False)
+
+	if entry.status == 'Completed':
+		return None
+	if entry.status in ('Pending', 'Voucher Created') and entry.modified > add_to_date(now_datetime(), minutes=-STALE_AFTER_MINUTES):
+		return None
+
+	# Failed, stale or voucher created without file: continue where the last attempt stopped
+	if entry.voucher_id:
+		values['status'] = 'Voucher Created'
+	frappe.db.set_value('Lexoffice Sync Ledger', ledger_name, values)
+	frappe.db.commit()
+	return frappe._dict(name=ledger_name, voucher_id=entry.voucher_id, retried=True)
+
+def set_voucher(ledger_name: str, voucher_id: str):
+	"""Record the created voucher, so a retry only uploads the file."""
+	frappe.db.set_value('Lexoffice Sync Ledger', ledger_name, {'status': 'Voucher Created', 'voucher_id': voucher_id})
+	frappe.db.commit()
+
+def complete(ledger_name: str, file_id: str = None, render_time: float = None, upload_time: float = None):
+	frappe.db.set_value('Lexoffice Sync Ledger', ledger_name, {
+		'status': 'Completed',
+		'file_id': file_id,
+		'completed_on': now_datetime(),
+		'render_time': render_time,
+		'upload_time': upload_time,
+		'error': None,
+	})
+	frappe.db.commit()
+
+def fail(ledger_name: str, error: str):
+	frappe.db.set_value('Lexoffice Sync Ledger', ledger_name, {'status': 'Failed', 'error': error})
+	frappe.db.commit()
@@ -0,0 +1,40 @@
+# Copyright (c) 2026, PC-Giga and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+
+
+class LexofficeUploadQueue(Document):
+	pass
+
+
+def enqueue(doctype: str, name: str, next_attempt=None, attempts: int = 0, error: str = None):
+	"""Record a submitted document for the next batch upload run (once)."""
+	if frappe.db.exists(
+		'Lexoffice Upload Queue',
+		{'reference_doctype': doctype, 'reference_name': name, 'status': ('in', ('Queued', 'Processing'))},
+	):
+		return
+
+	frappe.get_doc({
+		'doctype': 'Lexoffice Upload Queue',
+		'reference_doctype': doctype,
+		'reference_name': name,
+		'status': 'Queued',
+		'attempts': attempts,
+		'next_attempt': next_attempt or now_datetime(),
+		'error': error,
+	}).insert(ignore_permissions=True)
+
+def get_due_entries(fields: list, limit: int = None) -> list:
+	"""Queued entries whose next attempt is due, oldest first."""
+	return frappe.get_all(
+		'Lexoffice Upload Queue',
+		filters={'status': 'Queued'},
+		or_filters=[['next_attempt', 'is', 'not set'], ['next_attempt', '<=', now_datetime()]],
+		fields=fields,
+		order_by='creation asc',
+		limit=limit
+	)
@@ -0,0 +1,29 @@
+// Copyright (c) 2026, PC-Giga and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Lexoffice Sync Metrics"] = {
+	filters: [
+		{
+			fieldname: "metric",
+			label: __("Metric"),
+			fieldtype: "Select",
+			options: [
+				"",
+				"lexoffice_stage_duration_seconds",
+				"lexoffice_queue_wait_seconds",
+				"lexoffice_documents_total",
+				"lexoffice_http_request_duration_seconds",
+				"lexoffice_http_requests_total",
+				"lexoffice_http_retries_total",
+				"lexoffice_upload_bytes_total",
+			],
+		},
+	],
+	onload(report) {
+		report.page.add_inner_button(__("Reset"), () => {
+			frappe.confirm(__("Reset all Lexoffice metrics of this site?"), () => {
+				frappe.call("lexoffice.metrics.reset").then(() => report.refresh());
+			});
+		});
+	},
+};
@@ -0,0 +1,75 @@
+# Copyright (c) 2026, PC-Giga and contributors
+# For license information, please see license.txt
+
+import re
+
+from frappe import _
+
+from lexoffice.metrics import METRICS, get_metric_name, get_samples
+
+_LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def execute(filters=None):
+	"""Metrics of the site since the last reset: one row per metric and label set,
+	histograms with count, average and percentiles estimated from their buckets."""
+	filters = filters or {}
+	columns = [
+		{'fieldname': 'metric', 'label': _('Metric'), 'fieldtype': 'Data', 'width': 300},
+		{'fieldname': 'labels', 'label': _('Labels'), 'fieldtype': 'Data', 'width': 300},
+		{'fieldname': 'count', 'label': _('Count'), 'fieldtype': 'Float', 'precision': 0, 'width': 100},
+		{'fieldname': 'total', 'label': _('Total'), 'fieldtype': 'Float', 'precision': 3, 'width': 120},
+		{'fieldname': 'average', 'label': _('Average'), 'fieldtype': 'Float', 'precision': 3, 'width': 100},
+		{'fieldname': 'p50', 'label': _('p50'), 'fieldtype': 'Float', 'precision': 3, 'width': 100},
+		{'fieldname': 'p95', 'label': _('p95'), 'fieldtype': 'Float', 'precision': 3, 'width': 100},
+	]
+
+	rows = {}
+	for sample, value in get_samples().items():
+		metric = get_metric_name(sample)
+		if filters.get('metric') and metric != filters.get('metric'):
+			continue
+
+		name = sample.split('{', 1)[0]
+		labels = dict((key, value.replace('\\"', '"').replace('\\\\', '\\')) for key, value in _LABEL_PATTERN.findall(sample))
+		bucket = labels.pop('le', None)
+		row = rows.setdefault((metric, tuple(labels.items())), {
+			'metric': metric,
+			'labels': ', '.join(f'{key}={value}' for key, value in labels.items()),
+			'buckets': [],
+		})
+
+		if METRICS.get(metric, ('untyped',))[0] != 'histogram':
+			row['total'] = value
+		elif name.endswith('_bucket'):
+			row['buckets'].append((float(bucket), value))
+		elif name.endswith('_sum'):
+			row['total'] = value
+		elif name.endswith('_count'):
+			row['count'] = value
+
+	data = []
+	for key in sorted(rows):
+		row = rows[key]
+		buckets = sorted(row.pop('buckets'))
+		if row.get('count'):
+			row['average'] = row.get('total', 0) / row['count']
+			row['p50'] = get_percentile(buckets, row['count'], 0.5)
+			row['p95'] = get_percentile(buckets, row['count'], 0.95)
+		data.append(row)
+	return columns, data
+
+def get_percentile(buckets: list, count: float, quantile: float) -> float | None:
+	"""Estimate a percentile from cumulative histogram buckets (upper bound, count) by
+	linear interpolation within the bucket it falls into, like Prometheus' histogram_quantile."""
+	rank = quantile * count
+	lower_bound, lower_count = 0, 0
+	for upper_bound, cumulative in buckets:
+		if cumulative >= rank:
+			if upper_bound == float('inf'):
+				return lower_bound
+			if cumulative == lower_count:
+				return upper_bound
+			return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / (cumulative - lower_count)
+		lower_bound, lower_count = upper_bound, cumulative
+	return lower_bound
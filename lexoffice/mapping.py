@@ -0,0 +1,124 @@
+import json
+
+import frappe
+from frappe.utils import flt
+
+DEFAULT_CATEGORY_ID = '8f8664a1-fd86-11e1-a21f-0800200c9a66'    # Incomings
+
+# Difference between the tax computed per voucher item and the invoice's tax accepted as
+# rounding difference: per voucher item and tax row (where rounding happens), at most MAX_ROUNDING_DIFFERENCE
+ROUNDING_TOLERANCE = 0.01
+MAX_ROUNDING_DIFFERENCE = 0.05
+
+
+class CategoryMap:
+    """
+    lexoffice posting categories by Income or Expense Account and Item Group (see Lexoffice Settings).
+    """
+
+    def __init__(self, settings=None, doctype: str = 'Sales Invoice'):
+        settings = settings or frappe.get_cached_doc('Lexoffice Settings')
+        if doctype == 'Purchase Invoice':
+            self.default = settings.get('default_purchase_category_id')
+            # Also needed without automatic purchase uploads (e.g. backfill), lexoffice rejects items without category
+            if not self.default:
+                frappe.throw('Please set the Default Purchase Category ID in Lexoffice Settings to upload purchase invoices')
+        else:
+            self.default = settings.get('default_category_id') or DEFAULT_CATEGORY_ID
+        self.by_account = {}
+        self.by_item_group = {}
+        for mapping in settings.get('category_mappings') or []:
+            for account in (mapping.income_account, mapping.get('expense_account')):
+                if account:
+                    self.by_account.setdefault(account, mapping.category_id)
+            if mapping.item_group:
+                self.by_item_group.setdefault(mapping.item_group, mapping.category_id)
+
+    def get(self, item) -> str:
+        return (self.by_account.get(item.get('income_account') or item.get('expense_account'))
+                or self.by_item_group.get(item.item_group)
+                or self.default)
+
+    def get_for_account(self, account: str) -> str:
+        return self.by_account.get(account) or self.default
+
+
+def get_voucher_items(doc, categories: CategoryMap = None) -> list[dict]:
+    """
+    Map the items of an invoice to lexoffice voucher items, one per tax rate and category.
+
+    Items are grouped in a single pass, so this stays linear in the number of invoice lines.
+    Amounts are net, the tax of each group is computed from its rate and the rounding
+    difference to the invoice's total tax is booked on the largest group.
+    Fixed amount ('Actual') tax rows, e.g. freight, are charges without tax of their own,
+    booked with the category of their account.
+    Returns (credit notes) are negative in ERPNext, but positive in lexoffice.
+    """
+    categories = categories or CategoryMap(doctype=doc.doctype)
+    rates = get_item_tax_rates(doc)
+    sign = -1 if doc.get('is_return') else 1
+
+    groups = {}
+    for item in doc.get('items') or []:
+        key = (rates.get(item.item_code or item.item_name, 0.0), categories.get(item))
+        groups[key] = groups.get(key, 0.0) + sign * flt(item.net_amount)
+
+    if not groups:
+        groups[(0.0, categories.default)] = sign * flt(doc.net_total)
+
+    charges = 0.0
+    for tax in get_actual_charges(doc):
+        amount = sign * get_charge_amount(tax)
+        key = (0.0, categories.get_for_account(tax.account_head))
+        groups[key] = groups.get(key, 0.0) + amount
+        charges += amount
+
+    voucher_items = [{
+            'amount': flt(amount, 2),
+            'taxAmount': flt(amount * rate / 100, 2),
+            'taxRatePercent': rate,
+            'categoryId': category
+        }
+        for (rate, category), amount in groups.items()
+    ]
+
+    difference = flt(sign * flt(doc.total_taxes_and_charges, 2) - charges - sum(item['taxAmount'] for item in voucher_items), 2)
+    tolerance = flt(min(ROUNDING_TOLERANCE * (len(voucher_items) + len(doc.get('taxes') or [])), MAX_ROUNDING_DIFFERENCE), 2)
+    if abs(difference) > tolerance:
+        frappe.throw(
+            f'The taxes of {doc.doctype} {doc.name} differ by {difference} from the tax rates of its items, '
+            'which is more than a rounding difference. Please check the tax rows.'
+        )
+    if difference:
+        largest = max(voucher_items, key=lambda item: abs(item['amount']))
+        largest['taxAmount'] = flt(largest['taxAmount'] + difference, 2)
+
+    return voucher_items
+
+def get_actual_charges(doc) -> list:
+    # Valuation-only rows of purchase invoices are not part of the invoice total
+    return [tax for tax in doc.get('taxes') or [] if tax.charge_type == 'Actual' and tax.get('category') != 'Valuation']
+
+def get_charge_amount(tax) -> float:
+    """
+    Amount of a fixed amount ('Actual') tax row, after a discount on the grand total.
+    """
+    amount = tax.get('tax_amount_after_discount_amount')
+    amount = flt(tax.tax_amount if amount is None else amount)
+    return -amount if tax.get('add_deduct_tax') == 'Deduct' else amount
+
+def get_item_tax_rates(doc) -> dict[str, float]:
+    """
+    Total tax rate by item code, summed over the invoice's tax rows.
+    Fixed amount ('Actual') rows are not part of any rate, nor are valuation-only rows of
+    purchase invoices.
+    """
+    rates = {}
+    for tax in doc.get('taxes') or []:
+        if tax.charge_type == 'Actual' or tax.get('category') == 'Valuation' or not tax.item_wise_tax_detail:
+            continue
+        sign = -1 if tax.get('add_deduct_tax') == 'Deduct' else 1
+        for item_code, detail in json.loads(tax.item_wise_tax_detail).items():
+            rate = detail[0] if isinstance(detail, list) else detail
+            rates[item_code] = rates.get(item_code, 0.0) + sign * flt(rate)
+    return {item_code: flt(rate, 2) for item_code, rate in rates.items()}
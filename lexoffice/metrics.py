@@ -0,0 +1,231 @@
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import now_datetime
+from werkzeug.wrappers import Response
+
+from .api.metrics import RequestMetrics
+
+METRICS_KEY = 'lexoffice:metrics'
+
+# Seconds buffered measurements are kept in a process before they are added up in Redis
+FLUSH_INTERVAL = 10
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Type and help text of all metrics
+METRICS = {
+    'lexoffice_stage_duration_seconds': ('histogram', 'Duration of the stages of a document upload'),
+    'lexoffice_queue_wait_seconds': ('histogram', 'Time documents waited in a queue before their upload started'),
+    'lexoffice_documents_total': ('counter', 'Documents processed by doctype and result'),
+    'lexoffice_http_request_duration_seconds': ('histogram', 'Latency of lexoffice API requests by endpoint'),
+    'lexoffice_http_requests_total': ('counter', 'lexoffice API requests by endpoint and status'),
+    'lexoffice_http_retries_total': ('counter', 'Retries of lexoffice API requests by endpoint and reason'),
+    'lexoffice_upload_bytes_total': ('counter', 'Bytes of files uploaded to lexoffice'),
+}
+
+# Metrics of each site served by this worker process
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+class Metrics(RequestMetrics):
+    """
+    Metrics of a site in Prometheus format.
+
+    Measurements are buffered in the process and added up in a Redis hash shared by all
+    workers of the site, at the latest FLUSH_INTERVAL seconds after they were taken (and
+    at the end of every job). Safe to use from several threads; never raises.
+    """
+
+    def __init__(self, redis, key: str):
+        self.redis = redis
+        self.key = key
+        self._values = {}
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+
+    def inc(self, name: str, labels: dict, value: float = 1):
+        with self._lock:
+            sample = _sample(name, labels)
+            self._values[sample] = self._values.get(sample, 0) + value
+        self._flush_if_due()
+
+    def observe(self, name: str, labels: dict, seconds: float):
+        """
+        Add a duration to a histogram.
+        """
+        with self._lock:
+            values = self._values
+            for bucket in BUCKETS:
+                if seconds <= bucket:
+                    sample = _sample(f'{name}_bucket', {**labels, 'le': bucket})
+                    values[sample] = values.get(sample, 0) + 1
+            for sample, value in (
+                (_sample(f'{name}_bucket', {**labels, 'le': '+Inf'}), 1),
+                (_sample(f'{name}_sum', labels), seconds),
+                (_sample(f'{name}_count', labels), 1),
+            ):
+                values[sample] = values.get(sample, 0) + value
+        self._flush_if_due()
+
+    def observe_stage(self, stage: str, seconds: float, **labels):
+        self.observe('lexoffice_stage_duration_seconds', {'stage': stage, **labels}, seconds)
+
+    @contextmanager
+    def stage(self, stage: str, **labels):
+        """
+        Measure the duration of a stage of the upload (e.g. render, contact).
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.monotonic() - started, **labels)
+
+    def observe_request(self, method, endpoint, status, seconds):
+        self.inc('lexoffice_http_requests_total', {'method': method, 'endpoint': endpoint, 'status': status})
+        self.observe('lexoffice_http_request_duration_seconds', {'method': method, 'endpoint': endpoint}, seconds)
+
+    def count_retry(self, method, endpoint, reason):
+        self.inc('lexoffice_http_retries_total', {'method': method, 'endpoint': endpoint, 'reason': reason})
+
+    def count_upload(self, endpoint, bytes_sent):
+        self.inc('lexoffice_upload_bytes_total', {'endpoint': endpoint}, bytes_sent)
+
+    def flush(self):
+        """
+        Add the buffered measurements to Redis.
+        """
+        with self._lock:
+            values, self._values = self._values, {}
+            self._flushed = time.monotonic()
+        if not values:
+            return
+        try:
+            pipeline = self.redis.pipeline()
+            for sample, value in values.items():
+                pipeline.hincrbyfloat(self.key, sample, value)
+            pipeline.execute()
+        except Exception:
+            # Metrics must never break uploads
+            pass
+
+    def _flush_if_due(self):
+        if time.monotonic() - self._flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+
+def _sample(name: str, labels: dict) -> str:
+    """
+    Sample name with labels in Prometheus text format, e.g. 'name{stage="render"}'.
+    """
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+def get_metrics() -> Metrics:
+    """
+    Get the metrics of the current site (shared by all threads of this process).
+    """
+    key = frappe.cache().make_key(METRICS_KEY)
+    metrics = _registries.get(key)
+    if metrics is None:
+        with _registries_lock:
+            metrics = _registries.setdefault(key, Metrics(frappe.cache(), key))
+    return metrics
+
+def get_samples() -> dict[str, float]:
+    """
+    Current values of all samples of the site, added up over all workers.
+    """
+    metrics = get_metrics()
+    metrics.flush()
+    return {
+        (sample.decode() if isinstance(sample, bytes) else sample): float(value)
+        for sample, value in (frappe.cache().hgetall(metrics.key) or {}).items()
+    }
+
+def get_metric_name(sample: str) -> str:
+    name = sample.split('{', 1)[0]
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+            return name[:-len(suffix)]
+    return name
+
+def render_prometheus(samples: dict[str, float]) -> str:
+    """
+    Samples in the Prometheus text exposition format.
+    """
+    by_metric = {}
+    for sample in sorted(samples):
+        by_metric.setdefault(get_metric_name(sample), []).append(sample)
+
+    lines = []
+    for name, metric_samples in by_metric.items():
+        metric_type, help_text = METRICS.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.extend(f'{sample} {samples[sample]:g}' for sample in metric_samples)
+    return '\n'.join(lines) + '\n'
+
+@frappe.whitelist()
+def prometheus():
+    """
+    Metrics of the site for Prometheus (/api/method/lexoffice.metrics.prometheus).
+    """
+    frappe.only_for('System Manager')
+    return Response(render_prometheus(get_samples()), mimetype='text/plain; version=0.0.4')
+
+@frappe.whitelist()
+def reset():
+    """
+    Reset all metrics of the site.
+    """
+    frappe.only_for('System Manager')
+    metrics = get_metrics()
+    metrics.flush()
+    frappe.cache().delete(metrics.key)
+
+@contextmanager
+def maybe_profile(label: str):
+    """
+    Profile a job with cProfile if it is sampled (Profile Sample Rate in Lexoffice Settings).
+    The statistics are saved as private text File in the folder Home.
+    """
+    rate = frappe.db.get_single_value('Lexoffice Settings', 'profile_sample_rate')
+    if not rate or random.random() >= rate:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        save_profile(profile, label)
+
+def save_profile(profile: cProfile.Profile, label: str):
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(60)
+    try:
+        frappe.get_doc({
+            'doctype': 'File',
+            'file_name': f'lexoffice-profile-{label}-{now_datetime().strftime("%Y%m%d-%H%M%S")}.txt',
+            'content': stream.getvalue(),
+            'folder': 'Home',
+            'is_private': 1,
+        }).save(ignore_permissions=True)
+    except Exception:
+        frappe.log_error(title='Lexoffice: saving profile failed')
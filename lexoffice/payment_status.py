@@ -0,0 +1,84 @@
+import frappe
+from frappe.utils import flt
+
+from .api.datatypes import Voucher, VoucherType
+from .install import VOUCHER_STATUS_LABELS
+from .queues import BULK_QUEUE, get_queue
+from .reconcile import get_cursor, iter_changed_vouchers
+
+PAYMENT_STATUS_JOB_ID = 'lexoffice::payment_status'
+
+
+def process_payment_status():
+    """
+    Scheduled every 15 minutes.
+    Starts pulling the payment status if enabled (at most one run at a time).
+    """
+    if not frappe.db.get_single_value('Lexoffice Settings', 'pull_payment_status'):
+        return
+
+    frappe.enqueue(
+        method=pull_payment_status,
+        queue=get_queue(BULK_QUEUE),
+        timeout=3600,
+        job_id=PAYMENT_STATUS_JOB_ID,
+        deduplicate=True
+    )
+
+def pull_payment_status():
+    """
+    Copy status and open amount of the sales invoice vouchers changed in lexoffice since
+    the last run to their Sales Invoices. The cursor is saved after every batch.
+    """
+    settings = frappe.get_single('Lexoffice Settings')
+    api = settings.get_client()
+    for batch in iter_changed_vouchers(api, VoucherType.SALES_INVOICE, settings.payment_status_cursor):
+        update_payment_status(batch)
+        frappe.db.set_single_value('Lexoffice Settings', 'payment_status_cursor', get_cursor(batch))
+        frappe.db.commit()
+
+def update_payment_status(vouchers: list[Voucher]):
+    """
+    Write the payment status of a batch of vouchers with a few bulk updates.
+    Only invoices whose status or open amount actually changed are written.
+    """
+    by_number = {}
+    for voucher in vouchers:
+        if voucher.voucher_number:
+            by_number.setdefault(voucher.voucher_number, []).append(voucher)
+    if not by_number:
+        return
+
+    numbers = list(by_number)
+    invoices = frappe.get_all(
+        'Sales Invoice',
+        filters={'name': ('in', numbers), 'docstatus': 1},
+        fields=['name', 'lexoffice_status', 'lexoffice_open_amount']
+    )
+    synced = dict(frappe.get_all(
+        'Lexoffice Sync Ledger',
+        filters={'reference_doctype': 'Sales Invoice', 'reference_name': ('in', numbers), 'voucher_id': ('is', 'set')},
+        fields=['reference_name', 'voucher_id'],
+        as_list=True
+    ))
+
+    updates = {}
+    for invoice in invoices:
+        # Latest change wins (the batch is sorted by updatedDate), but only of the voucher
+        # synced for the invoice if known, not of duplicates
+        voucher_id = synced.get(invoice.name)
+        voucher = next((
+            voucher for voucher in reversed(by_number[invoice.name])
+            if voucher_id is None or str(voucher.id) == voucher_id
+        ), None)
+        if voucher is None:
+            continue
+
+        status = VOUCHER_STATUS_LABELS.get(voucher.to_dict().get('voucherStatus'))
+        open_amount = flt(voucher.open_amount)
+        if invoice.lexoffice_status != status or flt(invoice.lexoffice_open_amount) != open_amount:
+            updates[invoice.name] = {'lexoffice_status': status, 'lexoffice_open_amount': open_amount}
+
+    if updates:
+        # Keep modified, it drives the reconciliation of invoices
+        frappe.db.bulk_update('Sales Invoice', updates, update_modified=False)
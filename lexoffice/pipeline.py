@@ -0,0 +1,183 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+import frappe
+
+from .api.api import LexofficeClient
+from .api.exceptions import is_transient
+
+DEFAULT_UPLOAD_THREADS = 4
+
+
+class RenderError(Exception):
+    """ Rendering failed in a render process (carries the formatted traceback). """
+
+
+class PipelineResult:
+    key: str
+    doctype: str
+    name: str
+    voucher_id: str = None
+    file_id: str = None
+    pdf: bytes = None
+    rendered: bool = False
+    render_time: float = None
+    upload_time: float = None
+    voucher_time: float = None
+    error: str = None
+    transient: bool = False
+
+    def __init__(self, key, doctype, name, voucher_id=None, file_id=None, pdf=None, rendered=False,
+                 render_time=None, upload_time=None, voucher_time=None, error=None, transient=False):
+        self.key = key
+        self.doctype = doctype
+        self.name = name
+        self.voucher_id = voucher_id
+        self.file_id = file_id
+        self.pdf = pdf
+        self.rendered = rendered
+        self.render_time = render_time
+        self.upload_time = upload_time
+        # Part of upload_time spent creating the voucher
+        self.voucher_time = voucher_time
+        self.error = error
+        # The error may go away if retried later (see is_transient)
+        self.transient = transient
+
+
+class _UploadJob:
+    def __init__(self, key, doctype, name, voucher_data, voucher_id):
+        self.key = key
+        self.doctype = doctype
+        self.name = name
+        self.voucher_data = voucher_data
+        self.voucher_id = voucher_id
+
+
+class UploadPipeline:
+    """
+    Uploads many documents with PDF rendering and network I/O overlapping.
+
+    PDFs are rendered in a pool of processes (one per core by default), vouchers are created
+    and PDFs uploaded by a pool of threads. The number of documents in flight is bounded, so
+    submit() blocks while both stages are busy. Results are consumed in the calling thread
+    with results(), which is the only place that may touch the database.
+    """
+
+    def __init__(self, api: LexofficeClient, render_processes: int = None, upload_threads: int = None, max_pending: int = None):
+        self.api = api
+        render_processes = render_processes or os.cpu_count() or 1
+        upload_threads = upload_threads or DEFAULT_UPLOAD_THREADS
+        self._render_pool = ProcessPoolExecutor(
+            max_workers=render_processes,
+            mp_context=get_context('spawn'),
+            initializer=_init_render_process,
+            initargs=(frappe.local.site, frappe.local.sites_path)
+        )
+        self._upload_pool = ThreadPoolExecutor(max_workers=upload_threads, thread_name_prefix='lexoffice-upload')
+        self._slots = threading.BoundedSemaphore(max_pending or 2 * (render_processes + upload_threads))
+        self._results = queue.Queue()
+        self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._render_pool.shutdown(wait=True, cancel_futures=True)
+        self._upload_pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, key: str, doctype: str, name: str, voucher_data: dict, pdf: bytes = None, voucher_id: str = None):
+        """
+        Queue a document for rendering and upload. Blocks while the pipeline is full.
+
+        :param key: Key identifying the document in the results
+        :param voucher_data: Arguments of LexofficeClient.create_voucher (without the file)
+        :param pdf: PDF rendered before (skips rendering)
+        :param voucher_id: Voucher created before (only the PDF is uploaded)
+        """
+        job = _UploadJob(key, doctype, name, voucher_data, voucher_id)
+        self._slots.acquire()
+        try:
+            if pdf is not None:
+                self._upload_pool.submit(self._upload, job, pdf, None)
+            else:
+                future = self._render_pool.submit(_render, doctype, name)
+                future.add_done_callback(lambda f: self._on_rendered(job, f))
+        except Exception:
+            self._slots.release()
+            raise
+        self._pending += 1
+
+    def results(self, wait: bool = False):
+        """
+        Yield finished documents.
+
+        :param wait: Wait until all submitted documents are finished
+        """
+        while self._pending:
+            try:
+                result = self._results.get(block=wait)
+            except queue.Empty:
+                return
+            self._pending -= 1
+            yield result
+
+    def _on_rendered(self, job, future):
+        try:
+            pdf, render_time = future.result()
+        except Exception as e:
+            self._finish(PipelineResult(job.key, job.doctype, job.name, voucher_id=job.voucher_id, error=_format_error(e)))
+            return
+        self._upload_pool.submit(self._upload, job, pdf, render_time)
+
+    def _upload(self, job, pdf, render_time):
+        result = PipelineResult(job.key, job.doctype, job.name, voucher_id=job.voucher_id, pdf=pdf,
+                                rendered=render_time is not None, render_time=render_time)
+        started = time.monotonic()
+        try:
+            if not result.voucher_id:
+                result.voucher_id = self.api.create_voucher(**job.voucher_data)
+                result.voucher_time = time.monotonic() - started
+            upload = self.api.upload_voucher_file(result.voucher_id, pdf, filename=f'{job.name.replace("/", "-")}.pdf')
+            result.file_id = upload.file_id
+        except Exception as e:
+            result.error = _format_error(e)
+            result.transient = is_transient(e)
+        result.upload_time = time.monotonic() - started
+        self._finish(result)
+
+    def _finish(self, result):
+        self._results.put(result)
+        self._slots.release()
+
+
+def _format_error(e: Exception) -> str:
+    if isinstance(e, RenderError):
+        return str(e)
+    return ''.join(traceback.format_exception(e))
+
+
+def _init_render_process(site, sites_path):
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+
+def _render(doctype, name) -> tuple[bytes, float]:
+    from .events.sales_invoice import render_pdf
+    from .render import get_render_context
+
+    try:
+        # Start a new transaction, so documents submitted since the last task are visible
+        frappe.db.rollback()
+        started = time.monotonic()
+        pdf = render_pdf(frappe.get_doc(doctype, name), get_render_context())
+        return pdf, time.monotonic() - started
+    except Exception:
+        raise RenderError(frappe.get_traceback())
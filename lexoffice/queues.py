@@ -0,0 +1,52 @@
+import frappe
+
+from .api.ratelimit import RedisSemaphore
+
+# Dedicated queues, used if workers are configured for them in common_site_config.json, e.g.
+#   "workers": {"lexoffice": {"timeout": 1800}, "lexoffice_bulk": {"timeout": 7200}}
+# Interactive uploads need a worker of their own (`bench worker --queue lexoffice`): a worker
+# serving both queues only picks them first, they still wait while it runs a bulk job.
+QUEUE = 'lexoffice'
+BULK_QUEUE = 'lexoffice_bulk'
+FALLBACK_QUEUES = {QUEUE: 'default', BULK_QUEUE: 'long'}
+
+# Job timeout: base plus estimated seconds per invoice line, per MB of PDF and per document of a batch
+BASE_TIMEOUT = 120
+TIMEOUT_PER_ITEM = 0.2
+TIMEOUT_PER_MB = 30
+TIMEOUT_PER_DOCUMENT = 10
+MAX_TIMEOUT = 4 * 3600
+
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+def get_queue(queue: str) -> str:
+    """
+    The dedicated queue if a worker is configured for it, otherwise the standard queue
+    (default for interactive uploads, long for bulk runs).
+    """
+    return queue if queue in (frappe.conf.get('workers') or {}) else FALLBACK_QUEUES[queue]
+
+def get_upload_timeout(doc, pdf_size: int = 0) -> int:
+    """
+    Timeout of a job uploading one document, scaled to its number of lines and PDF size.
+    """
+    timeout = BASE_TIMEOUT + TIMEOUT_PER_ITEM * len(doc.get('items') or []) + TIMEOUT_PER_MB * pdf_size / 1024 ** 2
+    return int(min(timeout, MAX_TIMEOUT))
+
+def get_batch_timeout(documents: int, concurrency: int = 1) -> int:
+    """
+    Timeout of a batch run uploading the given number of documents.
+    """
+    timeout = BASE_TIMEOUT + TIMEOUT_PER_DOCUMENT * documents / max(concurrency, 1)
+    return int(min(timeout, MAX_TIMEOUT))
+
+def get_in_flight_limiter(limit: int = None, ttl: float = BASE_TIMEOUT) -> RedisSemaphore:
+    """
+    Semaphore limiting the single upload jobs in flight at once over all workers of the site
+    (Max. Uploads in Flight in Lexoffice Settings).
+
+    :param ttl: Seconds after which the slot of a crashed job is freed
+    """
+    limit = limit or frappe.db.get_single_value('Lexoffice Settings', 'max_in_flight') or DEFAULT_MAX_IN_FLIGHT
+    return RedisSemaphore(frappe.cache(), frappe.cache().make_key('lexoffice:in_flight'), limit, ttl=ttl)
@@ -0,0 +1,228 @@
+from datetime import datetime
+from typing import Iterator
+
+import frappe
+from frappe.utils import add_to_date, flt, now_datetime
+
+from .api.api import LexofficeClient
+from .api.datatypes import Voucher, VoucherStatus, VoucherType
+from .queues import BULK_QUEUE, get_queue
+from .lexoffice.doctype.lexoffice_reconciliation_issue import lexoffice_reconciliation_issue as issues
+
+RECONCILE_JOB_ID = 'lexoffice::reconcile'
+BATCH_SIZE = 1000
+AMOUNT_TOLERANCE = 0.01
+
+# Invoices submitted more recently may still be waiting for their upload
+UPLOAD_GRACE_MINUTES = 60
+
+
+def process_reconciliation():
+    """
+    Scheduled hourly.
+    Starts a reconciliation run if enabled (at most one run at a time).
+    """
+    if not frappe.db.get_single_value('Lexoffice Settings', 'reconcile'):
+        return
+
+    frappe.enqueue(
+        method=reconcile,
+        queue=get_queue(BULK_QUEUE),
+        timeout=3600,
+        job_id=RECONCILE_JOB_ID,
+        deduplicate=True
+    )
+
+def reconcile():
+    """
+    Compare lexoffice and ERPNext incrementally.
+
+    Only vouchers changed in lexoffice since the last run are fetched, and only Sales
+    Invoices modified since the last run are checked for a missing voucher. Both cursors
+    are saved after every batch, so an aborted run continues where it stopped.
+    Until all invoices were checked once, every voucher is fetched, so the invoices can be
+    matched against them instead of being looked up in lexoffice one by one (which would
+    take one API call per invoice).
+    """
+    settings = frappe.get_single('Lexoffice Settings')
+    api = settings.get_client()
+    invoice_cursor = settings.reconcile_invoice_cursor
+    voucher_cursor = settings.reconcile_voucher_cursor if invoice_cursor else None
+    vouchers = reconcile_vouchers(api, voucher_cursor)
+    reconcile_invoices(api, invoice_cursor, vouchers, all_vouchers=voucher_cursor is None)
+
+def reconcile_vouchers(api: LexofficeClient, cursor: str = None) -> dict:
+    """
+    Match the sales invoice vouchers changed since the cursor (updatedDate of the latest
+    voucher reconciled before) against submitted Sales Invoices by voucher number.
+
+    :return: Voucher IDs by voucher number of the vouchers fetched (except voided ones)
+    """
+    # Voucher IDs by voucher number of all vouchers seen in this run
+    seen = {}
+    vouchers = {}
+    # ID, status and dates of every voucher are read (some of them repeatedly), so decode them in one pass
+    for batch in iter_changed_vouchers(api, VoucherType.SALES_INVOICE, cursor, eager=True):
+        reconcile_voucher_batch(batch, seen)
+        for voucher in batch:
+            if voucher.voucher_number and get_status(voucher) != VoucherStatus.VOIDED.value:
+                vouchers.setdefault(voucher.voucher_number, str(voucher.id))
+        frappe.db.set_single_value('Lexoffice Settings', 'reconcile_voucher_cursor', get_cursor(batch))
+        frappe.db.commit()
+    return vouchers
+
+def iter_changed_vouchers(api: LexofficeClient, voucher_type: VoucherType, cursor: str = None,
+                          eager: bool = False) -> Iterator[list[Voucher]]:
+    """
+    Yield the vouchers changed since the cursor in batches, oldest change first.
+
+    :param cursor: updatedDate of the latest voucher processed before (see get_cursor)
+    :param eager: Decode all attributes of the vouchers in one pass (see LexofficeClient.iter_vouchers)
+    """
+    since = datetime.fromisoformat(cursor) if cursor else None
+    vouchers = api.iter_vouchers(
+        voucher_type,
+        sort='updatedDate,ASC',
+        eager=eager,
+        # lexoffice filters by day, vouchers of the cursor's day are skipped below
+        updated_date_from=since.date() if since else None
+    )
+
+    batch = []
+    for voucher in vouchers:
+        if since and voucher.updated_date < since:
+            continue
+        batch.append(voucher)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def get_cursor(vouchers: list[Voucher]) -> str:
+    return vouchers[-1].to_dict().get('updatedDate')
+
+def get_status(voucher: Voucher) -> str | None:
+    """
+    Raw voucherStatus of a voucher. lexoffice sends statuses VoucherStatus doesn't list
+    (e.g. unchecked), which must not stop the reconciliation.
+    """
+    return voucher.to_dict().get('voucherStatus')
+
+def reconcile_voucher_batch(vouchers: list[Voucher], seen: dict):
+    numbers = list({voucher.voucher_number for voucher in vouchers if voucher.voucher_number})
+    invoices = {invoice.name: invoice for invoice in frappe.get_all(
+        'Sales Invoice',
+        filters={'name': ('in', numbers)},
+        fields=['name', 'docstatus', 'grand_total']
+    )} if numbers else {}
+    synced = dict(frappe.get_all(
+        'Lexoffice Sync Ledger',
+        filters={'reference_doctype': 'Sales Invoice', 'reference_name': ('in', numbers), 'voucher_id': ('is', 'set')},
+        fields=['reference_name', 'voucher_id'],
+        as_list=True
+    )) if numbers else {}
+
+    # Start from a clean slate for these vouchers, issues still present are opened again below
+    issues.resolve({'voucher_id': ('in', [str(voucher.id) for voucher in vouchers])})
+    matched = []
+
+    for voucher in vouchers:
+        status = get_status(voucher)
+        if status == VoucherStatus.VOIDED.value:
+            continue
+
+        voucher_id = str(voucher.id)
+        number = voucher.voucher_number
+        values = dict(lexoffice_amount=voucher.total_amount, voucher_status=status)
+        invoice = invoices.get(number)
+        if not invoice or invoice.docstatus != 1:
+            issues.record('Missing in ERPNext', number, voucher_id=voucher_id, **values)
+            continue
+
+        matched.append(number)
+        values.update(reference_name=number, erpnext_amount=invoice.grand_total)
+
+        other_voucher_id = synced.get(number) or seen.setdefault(number, voucher_id)
+        if other_voucher_id != voucher_id:
+            issues.record('Duplicate', number, voucher_id=voucher_id, other_voucher_id=other_voucher_id, **values)
+
+        if abs(flt(voucher.total_amount) - flt(invoice.grand_total)) > AMOUNT_TOLERANCE:
+            issues.record('Amount Mismatch', number, voucher_id=voucher_id, **values)
+
+    if matched:
+        issues.resolve({'issue_type': 'Missing in lexoffice', 'reference_name': ('in', matched)})
+
+def reconcile_invoices(api: LexofficeClient, cursor=None, vouchers: dict = None, all_vouchers: bool = False):
+    """
+    Find Sales Invoices modified since the cursor that were never synced completely.
+
+    Invoices without a completed entry in the Lexoffice Sync Ledger (e.g. uploaded before
+    the ledger existed) are matched against the vouchers fetched by reconcile_vouchers and
+    reported as missing if there is no voucher. Only if these are just the vouchers changed
+    since the last run, invoices without a match are looked up in lexoffice by voucher number.
+
+    :param vouchers: Voucher IDs by voucher number (see reconcile_vouchers)
+    :param all_vouchers: vouchers contains every (not voided) voucher in lexoffice
+    """
+    vouchers = vouchers or {}
+    until = add_to_date(now_datetime(), minutes=-UPLOAD_GRACE_MINUTES)
+    last_name = None
+    while True:
+        if cursor is None:
+            since = ''
+        elif last_name is None:
+            since = 'and si.modified >= %(since)s'
+        else:
+            since = 'and (si.modified > %(since)s or (si.modified = %(since)s and si.name > %(last_name)s))'
+        candidates = frappe.db.sql("""
+            select si.name, si.grand_total, si.modified
+            from `tabSales Invoice` si
+            left join `tabLexoffice Sync Ledger` ledger
+                on ledger.name = concat('Sales Invoice::', si.name) and ledger.status = 'Completed'
+            where si.docstatus = 1 and si.modified < %(until)s {since}
+                and ledger.name is null
+            order by si.modified asc, si.name asc
+            limit %(limit)s
+        """.format(since=since), {'since': cursor, 'last_name': last_name, 'until': until, 'limit': BATCH_SIZE}, as_dict=True)
+        if not candidates:
+            break
+
+        found = []
+        for invoice in candidates:
+            if invoice.name in vouchers or (not all_vouchers and has_voucher(api, invoice.name)):
+                found.append(invoice.name)
+            else:
+                issues.record('Missing in lexoffice', invoice.name, reference_name=invoice.name,
+                              erpnext_amount=invoice.grand_total)
+        if found:
+            issues.resolve({'issue_type': 'Missing in lexoffice', 'reference_name': ('in', found)})
+
+        cursor, last_name = candidates[-1].modified, candidates[-1].name
+        # A full check is only matched locally and starts over if aborted, so it is completed
+        # with all vouchers again (instead of continuing with lookups of the remaining invoices)
+        if not all_vouchers:
+            frappe.db.set_single_value('Lexoffice Settings', 'reconcile_invoice_cursor', cursor)
+        frappe.db.commit()
+        if len(candidates) < BATCH_SIZE:
+            break
+
+    frappe.db.set_single_value('Lexoffice Settings', 'reconcile_invoice_cursor', until)
+    frappe.db.commit()
+
+def has_voucher(api: LexofficeClient, voucher_number: str) -> bool:
+    """
+    Look up whether lexoffice has a (not voided) sales invoice voucher with the number.
+    """
+    return find_voucher_id(api, VoucherType.SALES_INVOICE, voucher_number) is not None
+
+def find_voucher_id(api: LexofficeClient, voucher_type: VoucherType, voucher_number: str, contact_id: str = None) -> str | None:
+    """
+    ID of a (not voided) voucher with the type and number in lexoffice, optionally only of
+    the contact (numbers of purchase invoices are only unique per supplier).
+    """
+    for voucher in api.get_voucherlist(voucher_type, voucher_number=voucher_number):
+        raw = voucher.to_dict()
+        if get_status(voucher) != VoucherStatus.VOIDED.value and (not contact_id or raw.get('contactId') == contact_id):
+            return raw.get('id')
+    return None
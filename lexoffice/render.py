@@ -0,0 +1,60 @@
+import frappe
+from frappe.translate import get_all_translations
+
+VERSION_KEY = 'lexoffice:render_context_version'
+
+# Render context of each site served by this worker process
+_contexts = {}
+
+
+class RenderContext:
+    """
+    Everything PDF rendering needs from Lexoffice Settings, the Print Format and the Letter Head,
+    loaded once per worker process and shared by all invoices rendered against it.
+    """
+
+    def __init__(self, version):
+        settings = frappe.get_single('Lexoffice Settings')
+        self.version = version
+        self.print_format = settings.print_format
+        self.letterhead = settings.letterhead
+        self.lang = settings.lang
+
+        print_format = frappe.db.get_value(
+            'Print Format', self.print_format, ['print_format_builder_beta', 'modified'], as_dict=True
+        ) if self.print_format else None
+        self.print_format_builder_beta = bool(print_format and print_format.print_format_builder_beta)
+        self.print_format_modified = print_format.modified if print_format else None
+        self.letterhead_modified = frappe.db.get_value('Letter Head', self.letterhead, 'modified') if self.letterhead else None
+
+        if self.lang:
+            # Warm the (Redis-cached) translations of the render language
+            get_all_translations(self.lang)
+
+    def activate(self):
+        """
+        Switch to the render language.
+        Translations and the Jinja environment are only rebuilt if the language actually changes.
+        """
+        if self.lang and frappe.local.lang != self.lang:
+            frappe.local.lang = self.lang
+            frappe.local.lang_full_dict = None
+            frappe.local.jenv = None
+
+
+def get_render_context() -> RenderContext:
+    """
+    Get the render context of the current site (reloaded after invalidate()).
+    """
+    version = frappe.cache().get_value(VERSION_KEY)
+    context = _contexts.get(frappe.local.site)
+    if context is None or context.version != version:
+        context = _contexts[frappe.local.site] = RenderContext(version)
+    return context
+
+def invalidate(doc=None, method=None):
+    """
+    Make all workers reload their render context.
+    Called on update of Lexoffice Settings, Print Format and Letter Head.
+    """
+    frappe.cache().set_value(VERSION_KEY, frappe.generate_hash(length=10))
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from frappe.utils import add_to_date, now_datetime
+
+from .api.ratelimit import get_backoff
+from .lexoffice.doctype.lexoffice_failed_upload import lexoffice_failed_upload as failed_upload
+from .lexoffice.doctype.lexoffice_upload_queue.lexoffice_upload_queue import enqueue
+
+# Uploads failing temporarily (network, 429, 5xx) are retried with backoff up to this many attempts
+MAX_ATTEMPTS = 8
+RETRY_BASE_DELAY = 60
+RETRY_MAX_DELAY = 6 * 3600
+
+
+def get_next_attempt(attempts: int) -> datetime | None:
+    """
+    Time of the next attempt after a temporary failure (exponential backoff with full jitter),
+    or None if the retries are exhausted.
+
+    :param attempts: Number of attempts made so far
+    """
+    if attempts >= MAX_ATTEMPTS:
+        return None
+    return add_to_date(now_datetime(), seconds=get_backoff(attempts - 1, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY))
+
+def defer_failure(doctype: str, name: str, error: str, transient: bool, attempts: int = 1, payload: dict = None):
+    """
+    Handle a failed upload outside of the upload queue (single upload job, backfill):
+    temporary failures are retried by the upload queue, others are parked as Lexoffice Failed Upload.
+    """
+    next_attempt = get_next_attempt(attempts) if transient else None
+    if next_attempt:
+        enqueue(doctype, name, next_attempt=next_attempt, attempts=attempts, error=error)
+    else:
+        failed_upload.park(doctype, name, error, attempts,
+                           reason='Retries Exhausted' if transient else 'Permanent Error', payload=payload)
@@ -0,0 +1,196 @@
+import frappe
+from frappe.utils import now_datetime
+
+from .api.exceptions import is_transient
+from .contacts import get_contact_id
+from .documents import DOCUMENT_TYPES, get_document_type
+from .events.sales_invoice import (
+    archive_pdf, get_existing_pdf, get_pdf_content, get_pdf_file_name, get_voucher_data, recover_voucher
+)
+from .lexoffice.doctype.lexoffice_failed_upload import lexoffice_failed_upload as failed_upload
+from .lexoffice.doctype.lexoffice_sync_ledger import lexoffice_sync_ledger as sync_ledger
+from .lexoffice.doctype.lexoffice_upload_queue.lexoffice_upload_queue import get_due_entries
+from .metrics import get_metrics, maybe_profile
+from .pipeline import PipelineResult, UploadPipeline
+from .queues import BULK_QUEUE, get_batch_timeout, get_queue
+from .render import get_render_context
+from .retry import get_next_attempt
+
+UPLOAD_QUEUE_JOB_ID = 'lexoffice::upload_queue'
+
+
+def process_upload_queue():
+    """
+    Scheduled every minute.
+    Starts a batch run if there are queued uploads due (at most one run at a time).
+    """
+    if not get_due_entries(['name'], limit=1):
+        return
+
+    settings = frappe.get_single('Lexoffice Settings')
+    frappe.enqueue(
+        method=drain_upload_queue,
+        queue=get_queue(BULK_QUEUE),
+        timeout=get_batch_timeout(frappe.db.count('Lexoffice Upload Queue', {'status': 'Queued'}), settings.upload_threads),
+        job_id=UPLOAD_QUEUE_JOB_ID,
+        deduplicate=True
+    )
+
+def drain_upload_queue():
+    """
+    Uploads all queued documents in chunks of the configured batch size.
+    All uploads of a run share one client and one settings snapshot. PDF rendering and
+    API calls run concurrently in the upload pipeline.
+    """
+    settings = frappe.get_single('Lexoffice Settings')
+    if not any(settings.get(document_type.auto_upload_field) for document_type in DOCUMENT_TYPES.values()):
+        return
+
+    with maybe_profile('drain_upload_queue'):
+        _drain_upload_queue(settings)
+
+def _drain_upload_queue(settings):
+    api = settings.get_client()
+    metrics = get_metrics()
+    batch_size = settings.batch_size or 100
+
+    # Only one run is active at a time, so entries still processing were left by an aborted run
+    frappe.db.set_value('Lexoffice Upload Queue', {'status': 'Processing'}, 'status', 'Queued')
+    frappe.db.commit()
+
+    # Documents in flight are bounded by the pipeline's pools (see UploadPipeline),
+    # Max. Uploads in Flight only limits single upload jobs
+    with UploadPipeline(api, render_processes=settings.render_processes, upload_threads=settings.upload_threads) as pipeline:
+        while True:
+            entries = get_due_entries(
+                ['name', 'reference_doctype', 'reference_name', 'attempts', 'creation', 'next_attempt'], limit=batch_size
+            )
+            if not entries:
+                break
+
+            now = now_datetime()
+            for entry in entries:
+                waiting_since = entry.next_attempt or entry.creation
+                metrics.observe('lexoffice_queue_wait_seconds', {'queue': 'batch'}, max((now - waiting_since).total_seconds(), 0))
+
+            frappe.db.set_value('Lexoffice Upload Queue', {'name': ('in', [e.name for e in entries])}, 'status', 'Processing')
+            frappe.db.commit()
+
+            documents = {}
+            for entry in entries:
+                document = documents[entry.name] = frappe._dict(
+                    key=entry.name, doctype=entry.reference_doctype, name=entry.reference_name, attempts=entry.attempts
+                )
+                result = submit_document(document, pipeline, api)
+                if result:
+                    finish_queue_entry(document, result)
+                for result in pipeline.results():
+                    finish_queue_entry(documents[result.key], record_result(result, documents[result.key], settings))
+
+            for result in pipeline.results(wait=True):
+                finish_queue_entry(documents[result.key], record_result(result, documents[result.key], settings))
+            metrics.flush()
+
+def submit_document(document, pipeline: UploadPipeline, api) -> PipelineResult | None:
+    """
+    Prepare a document in this thread (database work) and hand it to the pipeline.
+    Documents completed before according to the sync ledger are not uploaded again.
+
+    :param document: _dict with key, doctype and name (voucher data, ledger entry and PDF file name are added)
+    :return: Result if the document was not handed to the pipeline (synced before or failed)
+    """
+    voucher_id = sync_ledger.get_completed_voucher_id(document.doctype, document.name)
+    if voucher_id:
+        return PipelineResult(document.key, document.doctype, document.name, voucher_id=voucher_id)
+
+    document.ledger = None
+    document.voucher_data = None
+    try:
+        doc = frappe.get_doc(document.doctype, document.name)
+        document_type = get_document_type(doc.doctype)
+        with get_metrics().stage('contact', doctype=doc.doctype):
+            contact_id = get_contact_id(api, document_type.party_type, document_type.get_party(doc))
+        voucher_data = document.voucher_data = get_voucher_data(doc, contact_id)
+
+        document.ledger = sync_ledger.begin(doc.doctype, doc.name)
+        if document.ledger is None:
+            voucher_id = sync_ledger.get_completed_voucher_id(doc.doctype, doc.name)
+            return PipelineResult(document.key, document.doctype, document.name, voucher_id=voucher_id,
+                                  error=None if voucher_id else 'Document is being synced by another job', transient=True)
+
+        render_context = get_render_context()
+        document.pdf_file_name = get_pdf_file_name(doc, render_context)
+        pdf_file = get_existing_pdf(doc, render_context)
+        pipeline.submit(
+            document.key, doc.doctype, doc.name, voucher_data,
+            pdf=get_pdf_content(pdf_file) if pdf_file else None,
+            voucher_id=recover_voucher(api, document.ledger, voucher_data)
+        )
+    except Exception as e:
+        frappe.db.rollback()
+        error = frappe.get_traceback()
+        if document.ledger:
+            sync_ledger.fail(document.ledger.name, error)
+        get_metrics().inc('lexoffice_documents_total', {'doctype': document.doctype, 'result': 'failed'})
+        return PipelineResult(document.key, document.doctype, document.name, error=error, transient=is_transient(e))
+
+def record_result(result: PipelineResult, document, settings) -> PipelineResult:
+    """
+    Record a document finished by the pipeline in the sync ledger and the metrics.
+    """
+    metrics = get_metrics()
+    if result.rendered:
+        metrics.observe_stage('render', result.render_time, doctype=result.doctype)
+    if result.voucher_time is not None:
+        metrics.observe_stage('create_voucher', result.voucher_time, doctype=result.doctype)
+    if result.upload_time is not None and not result.error:
+        metrics.observe_stage('upload_file', result.upload_time - (result.voucher_time or 0), doctype=result.doctype)
+    metrics.inc('lexoffice_documents_total', {'doctype': result.doctype, 'result': 'failed' if result.error else 'completed'})
+
+    if result.voucher_id and result.voucher_id != document.ledger.voucher_id:
+        sync_ledger.set_voucher(document.ledger.name, result.voucher_id)
+    if result.error:
+        sync_ledger.fail(document.ledger.name, result.error)
+    else:
+        sync_ledger.complete(document.ledger.name, result.file_id, render_time=result.render_time, upload_time=result.upload_time)
+
+    # Keep newly rendered PDFs, so retries and re-runs don't render them again.
+    # The ledger is up to date at this point, failing to archive the PDF is only logged.
+    if result.rendered and settings.archive_pdf:
+        try:
+            archive_pdf(result.pdf, result.doctype, result.name, document.pdf_file_name)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=f'Lexoffice: Archiving the PDF of {result.doctype} {result.name} failed')
+    return result
+
+def finish_queue_entry(document, result: PipelineResult):
+    """
+    Complete a queue entry or, if the upload failed, schedule a retry of temporary failures
+    and park permanent ones (and exhausted retries) as Lexoffice Failed Upload.
+    """
+    attempts = document.attempts + 1
+    next_attempt = get_next_attempt(attempts) if result.error and result.transient else None
+    if not result.error:
+        status = 'Completed'
+        failed_upload.resolve(document.doctype, document.name)
+    elif next_attempt:
+        status = 'Queued'
+    else:
+        status = 'Failed'
+        failed_upload.park(
+            document.doctype, document.name, result.error, attempts,
+            reason='Retries Exhausted' if result.transient else 'Permanent Error',
+            payload=document.get('voucher_data')
+        )
+
+    frappe.db.set_value('Lexoffice Upload Queue', document.key, {
+        'status': status,
+        'attempts': attempts,
+        'next_attempt': next_attempt,
+        'processed_on': now_datetime(),
+        'voucher_id': result.voucher_id,
+        'error': result.error
+    })
+    frappe.db.commit()
@@ -0,0 +1,226 @@
+# Copyright (c) 2026, PC-Giga and Contributors
+# See license.txt
+
+import copy
+import pickle
+import uuid
+from datetime import datetime
+
+from frappe.tests.utils import FrappeTestCase
+
+from lexoffice.api.datatypes import Invoice, Type, Voucher, VoucherList, VoucherStatus, VoucherType
+
+INVOICE = {
+    'id': 'e9066f04-8cc7-4616-93f8-ac9ecc8479c8',
+    'organizationId': 'aa93e8a8-2aa3-470b-b914-caad8a255dd8',
+    'createdDate': '2024-01-15T10:30:00.000+01:00',
+    'updatedDate': '2024-01-16T08:00:00.000+01:00',
+    'version': 2,
+    'language': 'de',
+    'archived': False,
+    'voucherStatus': 'open',
+    'voucherNumber': 'RE1019',
+    'voucherDate': '2024-01-15T00:00:00.000+01:00',
+    'dueDate': '2024-01-29T00:00:00.000+01:00',
+    'address': {
+        'contactId': '97c5794f-8ab2-43ad-b459-c5980b055e4d',
+        'name': 'Berliner Kindl GmbH',
+        'street': 'Jubiläumsweg 25',
+        'city': 'Berlin',
+        'zip': '14089',
+        'countryCode': 'DE',
+    },
+    'lineItems': [
+        {
+            'id': '97b98491-e953-4dc9-97a9-ae437a8052b4',
+            'type': 'material',
+            'name': 'Abus Kabelschloss Primo 590',
+            'quantity': 2,
+            'unitName': 'Stück',
+            'unitPrice': {'currency': 'EUR', 'netAmount': 13.4, 'grossAmount': 15.95, 'taxRatePercentage': 19},
+            'discountPercentage': 0,
+            'lineItemAmount': 26.8,
+        },
+        {
+            'type': 'text',
+            'name': 'Strukturieren Sie Ihre Belege durch Text-Elemente.',
+        },
+    ],
+    'totalPrice': {'currency': 'EUR', 'totalNetAmount': 26.8, 'totalGrossAmount': 31.89, 'totalTaxAmount': 5.09},
+}
+
+VOUCHERLIST = {
+    'content': [
+        {
+            'id': '4b2a3d6e-1f10-4c5e-9e35-2b0a6f9d8c11',
+            'voucherType': 'salesinvoice',
+            'voucherStatus': 'paid',
+            'voucherNumber': 'RE1019',
+            'voucherDate': '2024-01-15T00:00:00.000+01:00',
+            'createdDate': '2024-01-15T10:30:00.000+01:00',
+            'updatedDate': '2024-01-20T09:00:00.000+01:00',
+            'dueDate': None,
+            'contactId': '97c5794f-8ab2-43ad-b459-c5980b055e4d',
+            'contactName': 'Berliner Kindl GmbH',
+            'totalAmount': 31.89,
+            'openAmount': 0,
+            'currency': 'EUR',
+            'archived': False,
+        },
+        {
+            'id': '7d0c1e5a-8b6f-4d2e-a4c9-3f1b2e0d9a77',
+            'voucherType': 'salescreditnote',
+            'voucherStatus': 'open',
+            'voucherNumber': 'GS1001',
+            'voucherDate': '2024-01-18T00:00:00.000+01:00',
+            'createdDate': '2024-01-18T11:00:00.000+01:00',
+            'updatedDate': '2024-01-18T11:00:00.000+01:00',
+            'dueDate': '2024-02-01T00:00:00.000+01:00',
+            'contactId': '97c5794f-8ab2-43ad-b459-c5980b055e4d',
+            'contactName': 'Berliner Kindl GmbH',
+            'totalAmount': 11.9,
+            'openAmount': 11.9,
+            'currency': 'EUR',
+            'archived': False,
+        },
+    ],
+    'first': True,
+    'last': True,
+    'totalPages': 1,
+    'totalElements': 2,
+    'numberOfElements': 2,
+    'size': 250,
+    'number': 0,
+    'sort': [{'property': 'voucherdate', 'direction': 'DESC'}],
+}
+
+
+def read_invoice(invoice: Invoice) -> dict:
+    return {
+        'id': invoice.id,
+        'organization_id': invoice.organization_id,
+        'created_date': invoice.created_date,
+        'updated_date': invoice.updated_date,
+        'version': invoice.version,
+        'language': invoice.language,
+        'voucher_status': invoice.voucher_status,
+        'voucher_number': invoice.voucher_number,
+        'voucher_date': invoice.voucher_date,
+        'due_date': invoice.due_date,
+        'address': (invoice.address.contact_id, invoice.address.name, invoice.address.zip, invoice.address.countryCode),
+        'line_items': [
+            (item.id, item.type, item.name, item.quantity, item.unit_name,
+             (item.unit_price.currency, item.unit_price.net_amount, item.unit_price.gross_amount) if item.unit_price else None,
+             item.line_item_amount)
+            for item in invoice.line_items
+        ],
+        'total_price': (invoice.total_price.currency, invoice.total_price.total_net_amount,
+                        invoice.total_price.total_gross_amount, invoice.total_price.total_tax_amount),
+    }
+
+def read_voucher(voucher: Voucher) -> dict:
+    return {
+        'id': voucher.id,
+        'voucher_type': voucher.voucher_type,
+        'voucher_status': voucher.voucher_status,
+        'voucher_number': voucher.voucher_number,
+        'voucher_date': voucher.voucher_date,
+        'created_date': voucher.created_date,
+        'updated_date': voucher.updated_date,
+        'due_date': voucher.due_date,
+        'contact_id': voucher.contact_id,
+        'total_amount': voucher.total_amount,
+        'open_amount': voucher.open_amount,
+        'currency': voucher.currency,
+    }
+
+def decode_modes(record_class, data: dict):
+    """
+    Lazily decoded and one-pass decoded record of (a copy of) the data.
+    """
+    return record_class(copy.deepcopy(data)), record_class.decode(copy.deepcopy(data))
+
+
+class TestDatatypes(FrappeTestCase):
+
+    def test_invoice_values(self):
+        line_item = INVOICE['lineItems'][0]
+        expected = {
+            'id': uuid.UUID(INVOICE['id']),
+            'organization_id': uuid.UUID(INVOICE['organizationId']),
+            'created_date': datetime.fromisoformat(INVOICE['createdDate']),
+            'updated_date': datetime.fromisoformat(INVOICE['updatedDate']),
+            'version': 2,
+            'language': 'de',
+            'voucher_status': 'open',
+            'voucher_number': 'RE1019',
+            'voucher_date': datetime.fromisoformat(INVOICE['voucherDate']),
+            'due_date': datetime.fromisoformat(INVOICE['dueDate']),
+            'address': (uuid.UUID(INVOICE['address']['contactId']), 'Berliner Kindl GmbH', 14089, 'DE'),
+            'line_items': [
+                (uuid.UUID(line_item['id']), Type.MATERIAL, line_item['name'], 2, 'Stück', ('EUR', 13.4, 15.95), 26.8),
+                (None, Type.TEXT, INVOICE['lineItems'][1]['name'], None, None, None, None),
+            ],
+            'total_price': ('EUR', 26.8, 31.89, 5.09),
+        }
+        for invoice in decode_modes(Invoice, INVOICE):
+            self.assertEqual(read_invoice(invoice), expected)
+            self.assertEqual(invoice.to_dict(), INVOICE)
+
+    def test_voucherlist_values(self):
+        expected = [{
+            'id': uuid.UUID(raw['id']),
+            'voucher_type': VoucherType(raw['voucherType']),
+            'voucher_status': VoucherStatus(raw['voucherStatus']),
+            'voucher_number': raw['voucherNumber'],
+            'voucher_date': datetime.fromisoformat(raw['voucherDate']),
+            'created_date': datetime.fromisoformat(raw['createdDate']),
+            'updated_date': datetime.fromisoformat(raw['updatedDate']),
+            'due_date': datetime.fromisoformat(raw['dueDate']) if raw['dueDate'] else None,
+            'contact_id': raw['contactId'],
+            'total_amount': raw['totalAmount'],
+            'open_amount': raw['openAmount'],
+            'currency': raw['currency'],
+        } for raw in VOUCHERLIST['content']]
+        for voucherlist in decode_modes(VoucherList, VOUCHERLIST):
+            self.assertEqual([read_voucher(voucher) for voucher in voucherlist], expected)
+            self.assertEqual([read_voucher(voucher) for voucher in voucherlist.content], expected)
+            self.assertEqual((voucherlist.total_pages, voucherlist.total_elements, voucherlist.last), (1, 2, True))
+
+    def test_undecodable_field_raises_on_access(self):
+        data = copy.deepcopy(VOUCHERLIST['content'][0])
+        data['voucherStatus'] = 'unchecked'
+        data['voucherDate'] = 'not a date'
+        for voucher in decode_modes(Voucher, data):
+            # Decoding doesn't raise, reading the other attributes neither
+            self.assertEqual(voucher.voucher_number, 'RE1019')
+            self.assertEqual(voucher.id, uuid.UUID(data['id']))
+            self.assertRaises(ValueError, lambda: voucher.voucher_status)
+            self.assertRaises(ValueError, lambda: voucher.voucher_date)
+            # Still raises when read again
+            self.assertRaises(ValueError, lambda: voucher.voucher_status)
+
+    def test_setters_write_through(self):
+        for invoice in decode_modes(Invoice, INVOICE):
+            invoice.voucher_number = 'RE2000'
+            invoice.total_price.total_gross_amount = 35.0
+            self.assertEqual(invoice.voucher_number, 'RE2000')
+            self.assertEqual(invoice.to_dict()['voucherNumber'], 'RE2000')
+            self.assertEqual(invoice.to_dict()['totalPrice']['totalGrossAmount'], 35.0)
+
+    def test_pickle(self):
+        for invoice in decode_modes(Invoice, INVOICE):
+            # Partly read, so lazily decoded attributes are cached
+            invoice.address
+            copied = pickle.loads(pickle.dumps(invoice))
+            self.assertIs(type(copied), type(invoice))
+            self.assertEqual(read_invoice(copied), read_invoice(invoice))
+            self.assertEqual(copied.to_dict(), INVOICE)
+
+    def test_pickle_undecodable_field(self):
+        data = copy.deepcopy(VOUCHERLIST['content'][0])
+        data['voucherStatus'] = 'unchecked'
+        for voucher in decode_modes(Voucher, data):
+            copied = pickle.loads(pickle.dumps(voucher))
+            self.assertEqual(copied.voucher_number, 'RE1019')
+            self.assertRaises(ValueError, lambda: copied.voucher_status)
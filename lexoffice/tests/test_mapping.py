@@ -0,0 +1,100 @@
+# Copyright (c) 2026, PC-Giga and Contributors
+# See license.txt
+
+import json
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from lexoffice.mapping import CategoryMap, get_voucher_items
+
+DEFAULT_CATEGORY = 'category-default'
+FREIGHT_CATEGORY = 'category-freight'
+
+
+def make_invoice(items, taxes=(), is_return=0):
+    """
+    Sales Invoice with items as (item code, net amount) and taxes as (charge type, rates by item code
+    or fixed amount).
+    Tax amounts are computed per item and rounded per tax row, as ERPNext does.
+    """
+    sign = -1 if is_return else 1
+    doc = frappe._dict(
+        doctype='Sales Invoice',
+        name='ACC-SINV-TEST-00001',
+        is_return=is_return,
+        items=[frappe._dict(item_code=code, item_name=code, item_group='Products', income_account='Sales - T',
+                            net_amount=sign * amount) for code, amount in items],
+        taxes=[],
+    )
+    doc.net_total = sum(item.net_amount for item in doc['items'])
+    for charge_type, value in taxes:
+        if charge_type == 'Actual':
+            tax = frappe._dict(charge_type='Actual', account_head='Freight - T', tax_amount=sign * value,
+                               tax_amount_after_discount_amount=sign * value, item_wise_tax_detail=None)
+        else:
+            detail = {code: [value[code], round(amount * value[code] / 100, 2)] for code, amount in items}
+            tax = frappe._dict(charge_type=charge_type, account_head='VAT - T', item_wise_tax_detail=json.dumps(detail),
+                               tax_amount=sign * sum(amount for rate, amount in detail.values()))
+        doc.taxes.append(tax)
+    doc.total_taxes_and_charges = sum(tax.tax_amount for tax in doc.taxes)
+    return doc
+
+def get_categories():
+    return CategoryMap(frappe._dict(
+        default_category_id=DEFAULT_CATEGORY,
+        category_mappings=[frappe._dict(income_account='Freight - T', item_group=None, category_id=FREIGHT_CATEGORY)]
+    ))
+
+
+class TestMapping(FrappeTestCase):
+
+    def test_multiple_tax_rates(self):
+        doc = make_invoice([('A', 100), ('B', 10), ('C', 50)], [('On Net Total', {'A': 19, 'B': 19, 'C': 7})])
+        self.assertCountEqual(get_voucher_items(doc, get_categories()), [
+            {'amount': 110.0, 'taxAmount': 20.9, 'taxRatePercent': 19.0, 'categoryId': DEFAULT_CATEGORY},
+            {'amount': 50.0, 'taxAmount': 3.5, 'taxRatePercent': 7.0, 'categoryId': DEFAULT_CATEGORY},
+        ])
+
+    def test_actual_charge(self):
+        doc = make_invoice([('A', 100), ('B', 10), ('C', 50)],
+                           [('On Net Total', {'A': 19, 'B': 19, 'C': 7}), ('Actual', 5)])
+        self.assertCountEqual(get_voucher_items(doc, get_categories()), [
+            {'amount': 110.0, 'taxAmount': 20.9, 'taxRatePercent': 19.0, 'categoryId': DEFAULT_CATEGORY},
+            {'amount': 50.0, 'taxAmount': 3.5, 'taxRatePercent': 7.0, 'categoryId': DEFAULT_CATEGORY},
+            {'amount': 5.0, 'taxAmount': 0.0, 'taxRatePercent': 0.0, 'categoryId': FREIGHT_CATEGORY},
+        ])
+
+    def test_rounding_difference(self):
+        # 0.06 tax per item in ERPNext, 0.19 for the group of 0.99
+        doc = make_invoice([('A', 0.33), ('B', 0.33), ('C', 0.33)], [('On Net Total', {'A': 19, 'B': 19, 'C': 19})])
+        self.assertEqual(get_voucher_items(doc, get_categories()), [
+            {'amount': 0.99, 'taxAmount': 0.18, 'taxRatePercent': 19.0, 'categoryId': DEFAULT_CATEGORY},
+        ])
+
+    def test_return(self):
+        doc = make_invoice([('A', 100), ('C', 50)], [('On Net Total', {'A': 19, 'C': 7}), ('Actual', 5)], is_return=1)
+        self.assertCountEqual(get_voucher_items(doc, get_categories()), [
+            {'amount': 100.0, 'taxAmount': 19.0, 'taxRatePercent': 19.0, 'categoryId': DEFAULT_CATEGORY},
+            {'amount': 50.0, 'taxAmount': 3.5, 'taxRatePercent': 7.0, 'categoryId': DEFAULT_CATEGORY},
+            {'amount': 5.0, 'taxAmount': 0.0, 'taxRatePercent': 0.0, 'categoryId': FREIGHT_CATEGORY},
+        ])
+
+    def test_empty_invoice(self):
+        doc = make_invoice([])
+        self.assertEqual(get_voucher_items(doc, get_categories()), [
+            {'amount': 0.0, 'taxAmount': 0.0, 'taxRatePercent': 0.0, 'categoryId': DEFAULT_CATEGORY},
+        ])
+
+    def test_tax_difference_beyond_rounding(self):
+        doc = make_invoice([('A', 100)], [('On Net Total', {'A': 19})])
+        # e.g. a tax row charged on the previous row total, not covered by the item tax rates
+        doc.total_taxes_and_charges += 5
+        self.assertRaises(frappe.ValidationError, get_voucher_items, doc, get_categories())
+
+    def test_tax_difference_independent_of_lines(self):
+        # 1000 lines don't widen the tolerance: 0.10 is no rounding difference
+        items = [(f'ITEM-{index:04d}', 1) for index in range(1000)]
+        doc = make_invoice(items, [('On Net Total', {code: 19 for code, amount in items})])
+        doc.total_taxes_and_charges = 190.1
+        self.assertRaises(frappe.ValidationError, get_voucher_items, doc, get_categories())